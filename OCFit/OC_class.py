@@ -9,10 +9,12 @@ from time import time
 import sys
 import os
 import threading
+import multiprocessing
 import warnings
 
 import pickle
 import json
+import inspect
 
 #import matplotlib
 try:
@@ -33,6 +35,7 @@ from matplotlib import gridspec
 import numpy as np
 
 from scipy.optimize._differentialevolution import DifferentialEvolutionSolver
+from scipy.optimize import least_squares
 
 try: import emcee
 except ModuleNotFoundError: warnings.warn('Module emcee not found! Using FitMC will not be possible!')
@@ -40,9 +43,13 @@ except ModuleNotFoundError: warnings.warn('Module emcee not found! Using FitMC w
 try: import pymc
 except ModuleNotFoundError: warnings.warn('Module pymc not found! Using FitMC_old will not be possible!')
 
-from .ga import TPopul
+from .ga import TPopul,RandomGenerator,SpawnGenerators
+from . import kernels
+from .models import models,RegisterModel
+from .storage import ChainDB,TraceDB,chunk_size,SaveArrays,LoadArrays,IsArrays
 from .info_ga import InfoGA as InfoGAClass
 from .info_mc import InfoMC as InfoMCClass
+from .info_mc import ChainSummary,AutocorrTime
 
 #some constants
 AU=149597870700 #astronomical unit in meters
@@ -51,6 +58,8 @@ day=86400.    #number of seconds in day
 minutes=1440. #number of minutes in day
 year=365.2425   #days in year
 
+batch_size=2**14   #max. number of model values (individuals x data points) calculated at once by Chi2Batch (temporary arrays fit in CPU cache)
+
 def GetMax(x,n):
     '''return n max values in array x'''
     temp=[]
@@ -60,25 +69,6 @@ def GetMax(x,n):
         x[temp[-1]]=0
     return np.array(temp)
 
-class _Prior(object):
-    '''set uniform prior with limits'''
-    def _uniformLimit(self, **kwargs):
-        if kwargs["upper"] < kwargs["lower"]:
-            raise ValueError('Upper limit needs to be larger than lower! Correct limits of parameter "'+kwargs["name"]+'"!')
-        p = np.log(1.0 / (kwargs["upper"] - kwargs["lower"]))
-
-        def unilimit(ps, n, **rest):
-            if (ps[n] >= kwargs["lower"]) and (ps[n] <= kwargs["upper"]):
-                return p
-            else: return -np.Inf
-        return unilimit
-
-    def __call__(self, *args, **kwargs):
-        return self._callDelegator(*args, **kwargs)
-
-    def __init__(self, lnp, **kwargs):
-        self._callDelegator = self._uniformLimit(**kwargs)
-
 class _NumpyEncoder(json.JSONEncoder):
     """ Custom encoder for numpy data types """
     def default(self, obj):
@@ -124,6 +114,78 @@ def DeltaEpoch(e,w):
 
     return dE%1
 
+def _KeplerNewton(M,e,eps=1e-10,max_iter=100):
+    '''Newton-Raphson solver of Kepler Equation for 1D arrays M and e (same length)
+    with starting formula S9 given by Odell&Gooding (1986);
+    converged elements are masked out and not iterated anymore'''
+    M=np.mod(M,2*np.pi)
+    E=M+e*np.sin(M)/np.sqrt(1-2*e*np.cos(M)+e**2)  #starting formula S9
+    active=np.arange(len(M))   #not converged elements
+    for i in range(max_iter):
+        Ea=E[active]
+        ea=e[active]
+        dE=(Ea-ea*np.sin(Ea)-M[active])/(1-ea*np.cos(Ea))
+        E[active]=Ea-dE
+        active=active[np.abs(dE)>eps]
+        if len(active)==0: break
+    return np.mod(E,2*np.pi)
+
+def _KeplerMarkley(M,e):
+    '''Markley (1995) solver of Kepler Equation for 1D arrays M and e (same length)'''
+    pi2=np.pi**2
+    pi=np.pi
+
+    #if somewhere is M=0 or M=pi
+    M=np.mod(M,2*pi)
+    flip=M>pi
+    M=np.where(flip,2*pi-M,M)
+    M_0=np.round(M,14)==0
+    M_pi=np.round(M,14)==np.round(pi,14)
+
+    alpha=(3.*pi2+1.6*pi*(pi-abs(M))/(1.+e))/(pi2-6.)
+    d=3*(1-e)+alpha*e
+    r=3*alpha*d*(d-1+e)*M+M**3
+    q=2*alpha*d*(1-e)-M**2
+    w=(abs(r)+np.sqrt(q**3+r**2))**(2./3.)
+    E1=(2*r*w/(w**2+w*q+q**2)+M)/d
+    s=e*np.sin(E1)
+    f0=E1-s-M
+    f1=1-e*np.cos(E1)
+    f2=s
+    f3=1-f1
+    f4=-f2
+    d3=-f0/(f1-0.5*f0*f2/f1)
+    d4=-f0/(f1+0.5*d3*f2+(d3**2)*f3/6.)
+    d5=-f0/(f1+0.5*d4*f2+d4**2*f3/6.+d4**3*f4/24.)
+    E=E1+d5
+    E=np.where(flip,2*pi-E,E)
+    E[M_0]=0.
+    E[M_pi]=pi
+    return E
+
+def KeplerSolver(M,e,eps=1e-10):
+    '''solving Kepler Equation for arrays of mean anomalies and eccentricities
+    M - Mean anomaly (np.array or float) [rad]
+    e - eccentricity (np.array or float) - M and e could have any shapes which can be broadcast together
+    (eps - accurancy of Newton-Raphson method)
+    starting formula and method are chosen for each element separately:
+    Newton-Raphson method (Odell&Gooding, 1986) for e<0.9 and Markley (1995) for e>=0.9
+    output in rad in broadcasted shape of M and e
+    '''
+    M,e=np.broadcast_arrays(np.asarray(M,dtype=float),np.asarray(e,dtype=float))
+    shape=M.shape
+    M=M.ravel()
+    e=e.ravel()
+
+    E=np.empty(M.shape)
+    high=e>=0.9
+    if high.all(): E=_KeplerMarkley(M,e)
+    elif not high.any(): E=_KeplerNewton(M,e,eps)
+    else:
+        E[high]=_KeplerMarkley(M[high],e[high])
+        E[~high]=_KeplerNewton(M[~high],e[~high],eps)
+    return E.reshape(shape)
+
 def Epoch(t,t0,P,dE=0.5):
     '''calculate epoch with epoch diffence between minima dE'''
     E_obs=(t-t0)/P  #observed epoch
@@ -136,7 +198,359 @@ def Epoch(t,t0,P,dE=0.5):
     E=np.round(E_obs-min_type*dE)+min_type*dE
     return E,min_type
 
+class Ephemeris():
+    '''cache of epochs, types of minima and linear ephemeris (baseline t0+P*epoch)
+    values are calculated again only if times (also changed in place), linear ephemeris (t0, P) or dE are changed
+    copy of input array is kept - comparing with it is cheaper than calculation of values'''
+    def __init__(self):
+        self.Clear()
+
+    def Clear(self):
+        '''remove all cached values'''
+        self._epoch=None      #(copy of t, t0, P, dE, epoch, min_type)
+        self._baseline=None   #(copy of epoch, t0, P, baseline)
+
+    def Epoch(self,t,t0,P,dE=0.5):
+        '''epoch and type of minima for times "t" - see function Epoch'''
+        c=self._epoch
+        if c is None or not (c[1:4]==(t0,P,dE) and np.array_equal(c[0],t)):
+            epoch,min_type=Epoch(t,t0,P,dE)
+            c=(np.array(t),t0,P,dE,epoch,min_type)
+            self._epoch=c
+        return c[4],c[5]
+
+    def Baseline(self,epoch,t0,P):
+        '''linear ephemeris t0+P*epoch for given epochs'''
+        c=self._baseline
+        if c is None or not (c[1:3]==(t0,P) and np.array_equal(c[0],epoch)):
+            c=(np.array(epoch),t0,P,t0+P*np.asarray(epoch))
+            self._baseline=c
+        return c[3]
+
+def MethodValues(met,methods):
+    '''transform observing methods to errors / weights
+    met - array with observing methods of all minima
+    methods - dict with errors / weights of methods or name of text file with them (lines "method value")
+    '''
+    if isinstance(methods,str):
+        with open(methods,'r') as f:
+            methods={}
+            for l in f:
+                if not l[0]=='#' and len(l.strip())>0:
+                    tmp=l.split()
+                    methods[tmp[0].strip()]=float(tmp[1])
+    #each method is transformed only once
+    names,inv=np.unique(np.asarray(met),return_inverse=True)
+    missing=[m for m in names if not m in methods]
+    if len(missing)>0: raise KeyError('Values of methods '+', '.join(['"'+m+'"' for m in missing])+' are not given!')
+    return np.array([methods[m] for m in names],dtype=float)[inv]
+
+def LoadMinima(path,cols=None,delimiter=None,header=0,comments='#',methods=None,method_values='err'):
+    '''load table of observed minima from text file (whitespace or CSV) - fast loading of large files (millions of minima)
+    path - name of file
+    cols - dict with numbers of used columns (from 0): "tO" (observed times), "tC" (calculated times), "E" (epochs),
+        "oc" (O-C), "err" (errors), "w" (weights), "met" (observing methods); default: times in column 0, errors in column 1 (if given)
+    delimiter - delimiter of columns (e.g. "," for CSV); default: whitespace
+    header - number of skipped lines at beginning of file
+    comments - lines starting with this character are skipped
+    methods - errors / weights of observing methods (dict or name of file) - see MethodValues
+    method_values - values for methods are errors ("err") or weights ("w")
+    output - dict with arrays of loaded columns (+ errors / weights calculated from methods)
+    '''
+    if delimiter is not None and len(delimiter.strip())==0: delimiter=None
+    if cols is None:
+        #number of columns from first line with data
+        f=open(path,'r')
+        l=''
+        for i,l in enumerate(f):
+            if i>=header and len(l.strip())>0 and not l.startswith(comments): break
+        f.close()
+        cols={'tO':0}
+        if len(l.split(delimiter))>1: cols['err']=1
+
+    num=[c for c in cols if not c=='met']
+    data={}
+    if 'met' in cols:
+        #file is parsed only once - all columns as strings, numerical ones are converted afterwards
+        tmp=np.loadtxt(path,dtype=str,delimiter=delimiter,skiprows=header,comments=comments,ndmin=2,
+                       usecols=[cols[c] for c in num]+[cols['met']])
+        for i,c in enumerate(num): data[c]=tmp[:,i].astype(float)
+        data['met']=np.char.strip(tmp[:,-1])
+        if methods is not None:
+            if not method_values in ['err','w']: raise ValueError('Values of methods have to be errors ("err") or weights ("w")!')
+            data[method_values]=MethodValues(data['met'],methods)
+    elif len(num)>0:
+        tmp=np.loadtxt(path,delimiter=delimiter,skiprows=header,comments=comments,ndmin=2,usecols=[cols[c] for c in num])
+        for i,c in enumerate(num): data[c]=tmp[:,i]
+    return data
+
+def _MinimaData(data,t0=None,P=None,dE=0.5):
+    '''observed times, O-Cs and errors from loaded columns (see LoadMinima); O-Cs are calculated only if linear ephemeris is given'''
+    if 'tO' in data: t=data['tO']
+    else:
+        if not 'oc' in data: raise KeyError('Observed times or O-Cs have to be given!')
+        if 'tC' in data: tC=data['tC']
+        elif t0 is None or P is None: raise TypeError('t0 and P are not given!')
+        elif 'E' in data: tC=t0+P*data['E']
+        else: tC=t0+P*np.arange(len(data['oc']))
+        t=tC+data['oc']
+
+    if 'oc' in data: oc=data['oc']
+    elif t0 is not None and P is not None: oc=t-(t0+P*Epoch(t,t0,P,dE)[0])
+    else: oc=None
+
+    if 'err' in data: err=data['err']
+    elif 'w' in data: err=1./data['w']
+    else: err=None
+    return t,oc,err
+
+_worker={}   #data of worker process in pool (objective function)
+
+def _InitWorker(fit,names,spec=None):
+    '''initialization of worker process - data and model are shipped only once when pool is started'''
+    if spec is not None: models[spec.name]=spec   #model could be registered only in main process
+    _worker['chi2']=fit._Chi2Func(names)
+
+def _WorkerChi2(values):
+    '''calculate chi2 errors for part of population in worker process'''
+    return _worker['chi2'](values)
+
+#argument "seed" of DifferentialEvolutionSolver was renamed to "rng" in new scipy
+_de_rng='rng' if 'rng' in inspect.signature(DifferentialEvolutionSolver).parameters else 'seed'
+
+def _DESolver(func,bounds,rng=None,**kwargs):
+    '''DifferentialEvolutionSolver with given random generator'''
+    kwargs[_de_rng]=rng
+    return DifferentialEvolutionSolver(func,bounds,**kwargs)
+
+def _IslandEpoch(chi2,island,n_gen):
+    '''run "n_gen" generations of GA or DE on one island (independent population)
+    island - dict with state of population, its random generator and best solution found on island
+    output - updated island with best individuals of last generation as "migrants"
+    '''
+    k=island['n_migr']
+    if island['method']=='GA':
+        popul=island['popul']
+        for gen in range(n_gen):
+            objfun=chi2(popul.p)
+            order=np.argsort(objfun)
+            if objfun[order[0]]<island['chi2']:
+                island['chi2']=objfun[order[0]]
+                island['x']=np.array(popul.p[order[0]])
+            island['history'].append(island['chi2'])
+            island['migrants']=np.array(popul.p[order[:k]])
+            popul.Next(objfun)
+    else:
+        lower,width=island['bounds']
+        if island['popul'] is None: init='latinhypercube'
+        else: init=island['popul']
+        solver=_DESolver(lambda vals: chi2(vals.T),list(zip(lower,lower+width)),rng=island['rng'],
+                         maxiter=n_gen,popsize=island['size'],init=init,tol=0,polish=False,vectorized=True,**island['settings'])
+        for gen in range(n_gen):
+            next(solver)
+            if solver.population_energies[0]<island['chi2']:
+                island['chi2']=solver.population_energies[0]
+                island['x']=np.array(solver.x)
+            island['history'].append(island['chi2'])
+        order=np.argsort(solver.population_energies)
+        island['popul']=solver.population[order]*width+lower   #sorted from best to worst
+        island['migrants']=np.array(island['popul'][:k])
+    return island
+
+def _WorkerIsland(args):
+    '''run generations on one island in worker process'''
+    return _IslandEpoch(_worker['chi2'],*args)
+
+def _InitWorkerLnPost(lnpost):
+    '''initialization of worker process for emcee - log posterior (with data) is shipped only once'''
+    _worker['lnpost']=lnpost
+
+def _WorkerLnPost(values):
+    '''log posterior of one walker in worker process'''
+    return _worker['lnpost'](values)
+
+class _LnPost(object):
+    '''log posterior for emcee - uniform priors of free parameters and chi2 likelihood
+    object carries all data (it is picklable) -> it could be evaluated in worker processes'''
+    def __init__(self,fit,names,lower,upper,spec=None):
+        '''fit - object with data and function "_Chi2Func"
+        names - list of free parameters; lower, upper - limits of free parameters
+        spec - used model (ModelSpec) - registered again in worker processes
+        '''
+        self.fit=fit
+        self.names=list(names)
+        self.lower=np.array(lower,dtype=float)
+        self.upper=np.array(upper,dtype=float)
+        for i,p in enumerate(self.names):
+            if self.upper[i]<self.lower[i]:
+                raise ValueError('Upper limit needs to be larger than lower! Correct limits of parameter "'+p+'"!')
+        self.prior=np.sum(np.log(1.0/(self.upper-self.lower)))
+        self.spec=spec
+        self.pool=None   #pool of processes (started by _InitWorker) - walkers are split between workers
+        self.workers=1
+        self._chi2=None
+
+    def __getstate__(self):
+        '''function and pool of processes could not be pickled'''
+        state=dict(self.__dict__)
+        state['_chi2']=None
+        state['pool']=None
+        return state
+
+    def Chi2(self,values):
+        '''chi2 errors for matrix of values of free parameters'''
+        if self.pool is not None:
+            return np.concatenate(self.pool.map(_WorkerChi2,np.array_split(values,self.workers)))
+        if self._chi2 is None:
+            if self.spec is not None: models[self.spec.name]=self.spec
+            self._chi2=self.fit._Chi2Func(self.names)
+        return self._chi2(values)
+
+    def __call__(self,values):
+        values=np.asarray(values,dtype=float)
+        one=values.ndim==1   #only one walker
+        values=np.atleast_2d(values)
+        pdf=np.full(values.shape[0],-np.inf)
+        # If parameters are out of range, log prior is negative infinity,
+        # so no need to evaluate the likelihood function for them
+        inside=np.all((values>=self.lower)*(values<=self.upper),axis=1)
+        if inside.any(): pdf[inside]=self.prior-0.5*self.Chi2(values[inside])
+        if one: return pdf[0]
+        return pdf
+
+def _EmceeSampler(lnpost,walkers,dims,workers=1,vectorize=True):
+    '''create emcee sampler for log posterior "lnpost" (_LnPost object)
+    workers - number of processes: walkers are split between workers (vectorize=True) or evaluated one by one
+    vectorize - log posterior is calculated for all walkers at once
+    output - sampler and new pool of processes (has to be closed after sampling) or None
+    '''
+    pool=None
+    if workers>1 and not vectorize:
+        pool=multiprocessing.Pool(workers,initializer=_InitWorkerLnPost,initargs=(lnpost,))
+        return emcee.EnsembleSampler(int(walkers),int(dims),_WorkerLnPost,pool=pool),pool
+    if workers>1 and lnpost.pool is None:
+        pool=multiprocessing.Pool(workers,initializer=_InitWorker,initargs=(lnpost.fit,lnpost.names,lnpost.spec))
+        lnpost.pool=pool
+        lnpost.workers=workers
+    return emcee.EnsembleSampler(int(walkers),int(dims),lnpost,vectorize=vectorize),pool
+
+#default settings of convergence-driven stopping of MCMC fitting
+converge_mcmc={'block':1000,      #number of iterations between checks of convergence
+               'factor':50,       #chain has to be longer than "factor" autocorrelation times
+               'tol':0.01,        #max. relative change of autocorrelation time between checks
+               'acceptance':[0.1,0.9]}   #allowed range of mean acceptance fraction
+
+def _Converged(chain,tau_old,acceptance,settings):
+    '''check convergence of MCMC chain with shape (samples, walkers, params)
+    output - converged or not, autocorrelation times of params (in saved samples)
+    '''
+    tau=np.array([AutocorrTime(np.asarray(chain[:,:,i])) for i in range(chain.shape[2])])
+    if tau_old is None or not np.all(np.isfinite(tau)): return False,tau
+    ok=np.all(settings['factor']*tau<chain.shape[0])
+    ok*=np.all(np.abs(tau_old-tau)<settings['tol']*tau)
+    ok*=settings['acceptance'][0]<=acceptance<=settings['acceptance'][1]
+    return bool(ok),tau
+
+def _RunEmcee(sampler,pos,n_iter,burn,binn,visible=True,db=None,pnames=None,resume=False,converge=False,max_time=None,
+              callback=None):
+    '''run emcee sampler from starting positions "pos"
+    chain is saved to db continuously (in chunks) during sampling - see storage.ChainDB
+    resume - continue in previous (interrupted) run saved in db from last saved positions of walkers
+    converge - sampling in blocks is stopped when autocorrelation times are stable and acceptance fraction is reasonable
+        (True - default settings "converge_mcmc" or dict with own settings); "n_iter" is max. number of iterations
+    max_time - max. time of sampling (in seconds) - checked between blocks
+    callback - function called with progress of sampling (dict) between blocks; sampling is stopped if it returns True
+    output - chain with shape (samples, walkers, params) - memory-mapped if db is given
+        and info about sampling (dict - number of samples, acceptance fraction, autocorrelation times, reason of stopping)
+    '''
+    start=time()
+    n_samples=int(n_iter)//int(binn)
+    walkers,dims=np.shape(pos)
+    settings=None
+    if converge:
+        settings=dict(converge_mcmc)
+        if isinstance(converge,dict): settings.update(converge)
+
+    store=None
+    state=pos
+    if db is not None:
+        sampleArgs={}
+        sampleArgs["burn"] = int(burn)
+        sampleArgs["binn"] = int(binn)
+        sampleArgs["iters"] = int(n_iter)
+        sampleArgs["nwalker"] = int(walkers)
+        store=ChainDB(db,mode='r+')
+        if resume and store.Exists() and store.saved>0:
+            if not (store.pnames==list(pnames) and store.header['walkers']==walkers):
+                raise ValueError('Saved MCMC fitting in "'+db+'" has different fitted parameters or number of walkers!')
+            if not store.sampleArgs['binn']==int(binn):
+                raise ValueError('Saved MCMC fitting in "'+db+'" has different binning!')
+            sampleArgs['burn']=store.sampleArgs['burn']
+            store.Resize(n_samples,sampleArgs)
+            state=store.Last()   #last saved positions of walkers
+            burn=0
+        else: store.Create(pnames,walkers,n_samples,sampleArgs)
+    if burn>0:
+        # Run burn-in
+        state=sampler.run_mcmc(state,int(burn),progress=visible)
+        # Reset the chain to remove the burn-in samples.
+        sampler.reset()
+
+    if store is not None: n=max(1,chunk_size//(walkers*(dims+1)))   #number of samples saved at once
+    else: n=n_samples
+    if settings is not None: n=min(n,max(1,int(settings['block'])//int(binn)))
+    elif max_time is not None or callback is not None: n=min(n,max(1,converge_mcmc['block']//int(binn)))
+
+    def saved():
+        if store is None: return sampler.iteration
+        return store.saved
+
+    info={'stop':'n_iter','tau':None}
+    accepted=np.zeros(walkers)   #acceptance is counted also from removed (saved) parts of chain
+    steps=0
+    acceptance=np.nan
+    tau=None
+    while saved()<n_samples:
+        state=sampler.run_mcmc(state,min(n,n_samples-saved()),thin_by=int(binn),progress=visible)
+        acceptance=np.mean((accepted+sampler.backend.accepted)/float(steps+sampler.iteration))
+        if store is not None:
+            store.Append(sampler.get_chain(),sampler.get_log_prob())
+            accepted+=sampler.backend.accepted
+            steps+=sampler.iteration
+            sampler.reset()
+        if settings is not None and saved()<n_samples:
+            if store is None: chain=sampler.get_chain()
+            else: chain=store.chain
+            conv,tau=_Converged(chain,tau,acceptance,settings)
+            if conv:
+                info['stop']='converged'
+                break
+        if max_time is not None and time()-start>max_time and saved()<n_samples:
+            info['stop']='max_time'
+            break
+        if callback is not None and callback({'method':'MCMC','iteration':saved()*int(binn),'iterations':n_samples*int(binn),
+                                              'acceptance':acceptance,'time':time()-start}):
+            if saved()<n_samples: info['stop']='callback'
+            break
+
+    if store is None: chain=sampler.get_chain()
+    else: chain=store.chain
+    if tau is None or not info['stop']=='converged':
+        tau=[AutocorrTime(np.asarray(chain[:,:,i])) for i in range(dims)]
+    info['tau']=list(tau)
+    info['samples']=int(chain.shape[0])
+    info['iterations']=int(chain.shape[0]*int(binn))
+    info['acceptance']=float(acceptance)
+    info['time']=time()-start
+    if store is not None: store.SaveInfo(info)
+    return chain,info
+
 class Common():
+    def _Ephemeris(self):
+        '''cache of epochs and linear ephemeris (see Ephemeris)'''
+        if getattr(self,'_ephem',None) is None: self._ephem=Ephemeris()
+        return self._ephem
+
     def QuadTerm(self,M1=0,M2=0,M1_err=0,M2_err=0):
         '''calculate some params for quadratic model'''
         output={}
@@ -214,7 +628,7 @@ class Common():
         elif P is None: raise TypeError('P is not given!')
 
         old_epoch=self.epoch
-        if not len(self.epoch)==len(self.t): self.Epoch(self.t,t0,P)
+        if not len(self.epoch)==len(self.t): self.epoch=self._Ephemeris().Epoch(self.t,t0,P,self.dE)[0]
 
         f=open(name,'w')
         if weight is not None:
@@ -287,13 +701,41 @@ class SimpleFit(Common):
         self.new_oc=[]         #new O-C (residue)
         self.chi=0
         self._fit=''
+        self.fitInfo={}        #info about fitting (e.g. reason of stopping)
         self.tC=[]
 
+    @classmethod
+    def FromFile(cls,path,t0,P,cols=None,delimiter=None,header=0,methods=None,method_values='err',dE=0.5):
+        '''create class from file with observed minima (see LoadMinima)
+        t0 - time of zeros epoch
+        P - period
+        errors are calculated from weights (err=1/w) or from values of observing methods
+        '''
+        data=LoadMinima(path,cols,delimiter,header,methods=methods,method_values=method_values)
+        t,oc,err=_MinimaData(data,t0,P,dE)
+        return cls(t,t0,P,err=err,dE=dE)
+
     def Epoch(self):
-        '''calculate epoch'''
-        self.epoch,self._min_type=Epoch(self.t,self.t0,self.P,self.dE)
+        '''calculate epoch (only if times or ephemeris were changed)'''
+        self.epoch,self._min_type=self._Ephemeris().Epoch(self.t,self.t0,self.P,self.dE)
         return self.epoch
 
+    def _Chi2Func(self,names):
+        '''function calculating chi2 errors of ephemeris for matrix of values of free parameters "names"
+        (one row = one set of values); other parameters are fixed to values in "params" (or given linear ephemeris)'''
+        fixed={'t0':self._t0P[0],'P':self._t0P[1],'Q':0}
+        fixed.update(self.params)
+        names=list(names)
+
+        def chi2(values):
+            values=np.atleast_2d(np.array(values,dtype=float))
+            #params as columns -> broadcasting to matrix (sets of values x data points)
+            t0,P,Q=[values[:,names.index(p),np.newaxis] if p in names else fixed[p] for p in ['t0','P','Q']]
+            tC=t0+P*self.epoch+Q*self.epoch**2
+            return np.sum(((self.t-tC)/self.err)**2,axis=-1)
+
+        return chi2
+
     def PhaseCurve(self,P,t0,plot=False):
         '''create phase curve'''
         f=np.mod(self.t-t0,P)/float(P)    #phase
@@ -851,7 +1293,8 @@ class FitLinear(SimpleFit):
 
         return self.new_oc
 
-    def FitMCMC(self,n_iter,limits,steps,fit_params=None,burn=0,binn=1,walkers=0,visible=True,db=None):
+    def FitMCMC(self,n_iter,limits,steps,fit_params=None,burn=0,binn=1,walkers=0,visible=True,db=None,
+                workers=1,vectorize=True,resume=False,converge=False,max_time=None,seed=None,callback=None):
         '''fitting with Markov chain Monte Carlo using emcee
         n_iter - number of MC iteration - should be at least 1e5
         limits - limits of parameters for fitting
@@ -862,18 +1305,25 @@ class FitLinear(SimpleFit):
         walkers - number of walkers - should be at least 2-times number of fitted parameters
         visible - display status of fitting
         db - name of database to save MCMC fitting details (could be analysed later using InfoMCMC function)
+        workers - number of processes for multiprocessing
+        vectorize - calculate all walkers at once (split between workers) or one by one
+        resume - continue in interrupted fitting saved in db (chain is saved continuously during fitting)
+        converge - stop fitting when chain converged (n_iter is max. number of iterations); True or dict with settings
+            (see converge_mcmc - checked every "block" iterations)
+        max_time - max. time of fitting in seconds
+        info about fitting (reason of stopping, number of samples, acceptance fraction, autocorrelation times) is in "fitInfo"
+        seed - seed (or np.random.Generator) for reproducible fitting (default - from global numpy random state)
+        callback - function called with progress of fitting (dict); fitting is stopped if it returns True
         '''
 
         #setting emcee priors for fitted parameters
         if fit_params is None: fit_params=['P','t0']
         vals0={'P': self._t0P[1], 't0': self._t0P[0]}
         vals1={}
-        priors={}
         for p in ['P','t0']:
             if p in self.params: vals1[p]=self.params[p]
             else: vals1[p]=vals0[p]
-            if p in fit_params:
-                priors[p]=_Prior("limuniform",lower=limits[p][0],upper=limits[p][1],name=p)
+        lnpost=_LnPost(self,fit_params,[limits[p][0] for p in fit_params],[limits[p][1] for p in fit_params])
 
         dims=len(fit_params)
         if walkers==0: walkers=dims*2
@@ -881,39 +1331,10 @@ class FitLinear(SimpleFit):
             walkers=dims*2
             warnings.warn('Numbers of walkers is smaller than two times number of free parameters. Auto-set to '+str(int(walkers))+'.')
 
-
-        def likeli(names, vals):
-            '''likelihood function for emcee'''
-            pp={n:v for n,v in zip(names,vals)}
-
-            if 'P' in pp: P=pp['P']
-            else: P=vals1['P']
-            if 't0' in pp: t0=pp['t0']
-            else: t0=vals1['t0']
-
-            tC=t0+P*self.epoch
-            chi=np.sum(((self.t-tC)/self.err)**2)
-
-            likeli=-0.5*chi
-            return likeli
-
-        def lnpostdf(values):
-            # Parameter-Value dictionary
-            ps = dict(zip(fit_params,values))
-            # Check prior information
-            prior_sum = 0
-            for name in fit_params: prior_sum += priors[name](ps, name)
-            # If log prior is negative infinity, parameters
-            # are out of range, so no need to evaluate the
-            # likelihood function at this step:
-            pdf = prior_sum
-            if pdf == -np.inf: return pdf
-            # Likelihood
-            pdf += likeli(fit_params, values)
-            return pdf
-
         # Generate the sampler
-        emceeSampler=emcee.EnsembleSampler(int(walkers),int(dims),lnpostdf)
+        emceeSampler,pool=_EmceeSampler(lnpost,walkers,dims,workers,vectorize)
+        rng=RandomGenerator(seed)
+        emceeSampler.random_state=np.random.RandomState(rng.integers(2**31)).get_state()
 
         # Generate starting values
         pos = []
@@ -925,7 +1346,7 @@ class FitLinear(SimpleFit):
                 while True:
                     if tc == 100:
                         raise ValueError('Could not determine valid starting point for parameter: "'+n+'" due to its limits! Try to change the limits and/or step.')
-                    propval = np.random.normal(vals1[n],steps[n])
+                    propval = rng.normal(vals1[n],steps[n])
                     if propval < limits[n][0]:
                         tc += 1
                         continue
@@ -935,24 +1356,11 @@ class FitLinear(SimpleFit):
                     break
                 pos[-1][i] = propval
 
-        # Default value for state
-        state = None
-
-        if burn>0:
-            # Run burn-in
-            pos,prob,state=emceeSampler.run_mcmc(pos,int(burn),progress=visible)
-            # Reset the chain to remove the burn-in samples.
-            emceeSampler.reset()
-
-        pos,prob,state=emceeSampler.run_mcmc(pos,int(n_iter),rstate0=state,thin=int(binn),progress=visible)
-
-        if not db is None:
-            sampleArgs={}
-            sampleArgs["burn"] = int(burn)
-            sampleArgs["binn"] = int(binn)
-            sampleArgs["iters"] = int(n_iter)
-            sampleArgs["nwalker"] = int(walkers)
-            np.savez_compressed(open(db,'wb'),chain=emceeSampler.chain,lnp=emceeSampler.lnprobability,                               pnames=list(fit_params),sampleArgs=sampleArgs)
+        chain,self.fitInfo=_RunEmcee(emceeSampler,pos,n_iter,burn,binn,visible,db,fit_params,resume,converge,max_time,callback)
+        if pool is not None:
+            pool.close()
+            pool.join()
+        flat=chain.reshape((-1,dims))
 
         self.params_err={} #remove errors of parameters
 
@@ -960,8 +1368,8 @@ class FitLinear(SimpleFit):
             #calculate values and errors of parameters and save them
             if p in fit_params:
                 i=fit_params.index(p)
-                self.params[p]=np.mean(emceeSampler.flatchain[:,i])
-                self.params_err[p]=np.std(emceeSampler.flatchain[:,i])
+                self.params[p]=np.mean(flat[:,i])
+                self.params_err[p]=np.std(flat[:,i])
             else:
                 self.params[p]=vals1[p]
                 #self.params_err[p]='---'
@@ -1143,7 +1551,8 @@ class FitQuad(SimpleFit):
 
         return self.new_oc
 
-    def FitMCMC(self,n_iter,limits,steps,fit_params=None,burn=0,binn=1,walkers=0,visible=True,db=None):
+    def FitMCMC(self,n_iter,limits,steps,fit_params=None,burn=0,binn=1,walkers=0,visible=True,db=None,
+                workers=1,vectorize=True,resume=False,converge=False,max_time=None,seed=None,callback=None):
         '''fitting with Markov chain Monte Carlo using emcee
         n_iter - number of MC iteration - should be at least 1e5
         limits - limits of parameters for fitting
@@ -1154,18 +1563,25 @@ class FitQuad(SimpleFit):
         walkers - number of walkers - should be at least 2-times number of fitted parameters
         visible - display status of fitting
         db - name of database to save MCMC fitting details (could be analysed later using InfoMCMC function)
+        workers - number of processes for multiprocessing
+        vectorize - calculate all walkers at once (split between workers) or one by one
+        resume - continue in interrupted fitting saved in db (chain is saved continuously during fitting)
+        converge - stop fitting when chain converged (n_iter is max. number of iterations); True or dict with settings
+            (see converge_mcmc - checked every "block" iterations)
+        max_time - max. time of fitting in seconds
+        info about fitting (reason of stopping, number of samples, acceptance fraction, autocorrelation times) is in "fitInfo"
+        seed - seed (or np.random.Generator) for reproducible fitting (default - from global numpy random state)
+        callback - function called with progress of fitting (dict); fitting is stopped if it returns True
         '''
 
         #setting emcee priors for fitted parameters
         if fit_params is None: fit_params=['Q','P','t0']
         vals0={'P': self._t0P[1], 't0': self._t0P[0], 'Q':0}
         vals1={}
-        priors={}
         for p in ['P','t0','Q']:
             if p in self.params: vals1[p]=self.params[p]
             else: vals1[p]=vals0[p]
-            if p in fit_params:
-                priors[p]=_Prior("limuniform",lower=limits[p][0],upper=limits[p][1],name=p)
+        lnpost=_LnPost(self,fit_params,[limits[p][0] for p in fit_params],[limits[p][1] for p in fit_params])
 
         dims=len(fit_params)
         if walkers==0: walkers=dims*2
@@ -1173,41 +1589,10 @@ class FitQuad(SimpleFit):
             walkers=dims*2
             warnings.warn('Numbers of walkers is smaller than two times number of free parameters. Auto-set to '+str(int(walkers))+'.')
 
-
-        def likeli(names, vals):
-            '''likelihood function for emcee'''
-            pp={n:v for n,v in zip(names,vals)}
-
-            if 'Q' in pp: Q=pp['Q']
-            else: Q=vals1['Q']
-            if 'P' in pp: P=pp['P']
-            else: P=vals1['P']
-            if 't0' in pp: t0=pp['t0']
-            else: t0=vals1['t0']
-
-            tC=t0+P*self.epoch+Q*self.epoch**2
-            chi=np.sum(((self.t-tC)/self.err)**2)
-
-            likeli=-0.5*chi
-            return likeli
-
-        def lnpostdf(values):
-            # Parameter-Value dictionary
-            ps = dict(zip(fit_params,values))
-            # Check prior information
-            prior_sum = 0
-            for name in fit_params: prior_sum += priors[name](ps, name)
-            # If log prior is negative infinity, parameters
-            # are out of range, so no need to evaluate the
-            # likelihood function at this step:
-            pdf = prior_sum
-            if pdf == -np.inf: return pdf
-            # Likelihood
-            pdf += likeli(fit_params, values)
-            return pdf
-
         # Generate the sampler
-        emceeSampler=emcee.EnsembleSampler(int(walkers),int(dims),lnpostdf)
+        emceeSampler,pool=_EmceeSampler(lnpost,walkers,dims,workers,vectorize)
+        rng=RandomGenerator(seed)
+        emceeSampler.random_state=np.random.RandomState(rng.integers(2**31)).get_state()
 
         # Generate starting values
         pos = []
@@ -1219,7 +1604,7 @@ class FitQuad(SimpleFit):
                 while True:
                     if tc == 100:
                         raise ValueError('Could not determine valid starting point for parameter: "'+n+'" due to its limits! Try to change the limits and/or step.')
-                    propval = np.random.normal(vals1[n],steps[n])
+                    propval = rng.normal(vals1[n],steps[n])
                     if propval < limits[n][0]:
                         tc += 1
                         continue
@@ -1229,24 +1614,11 @@ class FitQuad(SimpleFit):
                     break
                 pos[-1][i] = propval
 
-        # Default value for state
-        state = None
-
-        if burn>0:
-            # Run burn-in
-            pos,prob,state=emceeSampler.run_mcmc(pos,int(burn),progress=visible)
-            # Reset the chain to remove the burn-in samples.
-            emceeSampler.reset()
-
-        pos,prob,state=emceeSampler.run_mcmc(pos,int(n_iter),rstate0=state,thin=int(binn),progress=visible)
-
-        if not db is None:
-            sampleArgs={}
-            sampleArgs["burn"] = int(burn)
-            sampleArgs["binn"] = int(binn)
-            sampleArgs["iters"] = int(n_iter)
-            sampleArgs["nwalker"] = int(walkers)
-            np.savez_compressed(open(db,'wb'),chain=emceeSampler.chain,lnp=emceeSampler.lnprobability,                               pnames=list(fit_params),sampleArgs=sampleArgs)
+        chain,self.fitInfo=_RunEmcee(emceeSampler,pos,n_iter,burn,binn,visible,db,fit_params,resume,converge,max_time,callback)
+        if pool is not None:
+            pool.close()
+            pool.join()
+        flat=chain.reshape((-1,dims))
 
         self.params_err={} #remove errors of parameters
 
@@ -1254,8 +1626,8 @@ class FitQuad(SimpleFit):
             #calculate values and errors of parameters and save them
             if p in fit_params:
                 i=fit_params.index(p)
-                self.params[p]=np.mean(emceeSampler.flatchain[:,i])
-                self.params_err[p]=np.std(emceeSampler.flatchain[:,i])
+                self.params[p]=np.mean(flat[:,i])
+                self.params_err[p]=np.std(flat[:,i])
             else:
                 self.params[p]=vals1[p]
                 #self.params_err[p]='---'
@@ -1393,7 +1765,7 @@ class ComplexFit():
         '''solving Kepler Equation using Newton-Raphson method
         with starting formula S9 given by Odell&Gooding (1986)
         M - Mean anomaly (np.array, float or list) [rad]
-        e - eccentricity
+        e - eccentricity (float or np.array broadcastable with M)
         (eps - accurancy)
         output in rad in same format as M
         '''
@@ -1402,7 +1774,7 @@ class ComplexFit():
         if isinstance(M,int) or isinstance(M,float):
             #M is float
             if M==0.: return 0.
-            M=np.array(M)
+            M=np.array([M])
             len1=True
         lst=False
         if isinstance(M,list):
@@ -1410,13 +1782,8 @@ class ComplexFit():
             lst=True
             M=np.array(M)
 
-        E0=M+e*np.sin(M)/np.sqrt(1-2*e*np.cos(M)+e**2)  #starting formula S9
-        E=E0-(E0-e*np.sin(E0)-M)/(1-e*np.cos(E0))
-        while (abs(E-E0)>eps).any():
-            E0=E
-            E=E-(E-e*np.sin(E)-M)/(1-e*np.cos(E))
-        while (E<0).any(): E[np.where(E<0)]+=2*np.pi
-        while (E>2*np.pi).any(): E[np.where(E>2*np.pi)]-=2*np.pi
+        M,e=np.broadcast_arrays(np.asarray(M,dtype=float),np.asarray(e,dtype=float))
+        E=_KeplerNewton(M.ravel(),e.ravel(),eps).reshape(M.shape)
         if len1: return E[0]  #output is float
         if lst: return list(E)  #output is list
         return E
@@ -1425,7 +1792,7 @@ class ComplexFit():
     def KeplerEQMarkley(self,M,e):
         '''solving Kepler Equation - Markley (1995): Kepler Equation Solver
         M - Mean anomaly (np.array, float or list) [rad]
-        e - eccentricity
+        e - eccentricity (float or np.array broadcastable with M)
         output in rad in same format as M
         '''
         #if input is not np.array
@@ -1433,7 +1800,7 @@ class ComplexFit():
         if isinstance(M,int) or isinstance(M,float):
             #M is float
             if M==0.: return 0.
-            M=np.array(M)
+            M=np.array([M])
             len1=True
         lst=False
         if isinstance(M,list):
@@ -1441,35 +1808,8 @@ class ComplexFit():
             lst=True
             M=np.array(M)
 
-        pi2=np.pi**2
-        pi=np.pi
-
-        #if somewhere is M=0 or M=pi
-        M=M-(np.floor(M/(2*pi))*2*pi)
-        flip=np.where(M>pi)
-        M[flip]=2*pi-M[flip]
-        M_0=np.where(np.round_(M,14)==0)
-        M_pi=np.where(np.round_(M,14)==np.round_(pi,14))
-
-        alpha=(3.*pi2+1.6*pi*(pi-abs(M))/(1.+e))/(pi2-6.)
-        d=3*(1-e)+alpha*e
-        r=3*alpha*d*(d-1+e)*M+M**3
-        q=2*alpha*d*(1-e)-M**2
-        w=(abs(r)+np.sqrt(q**3+r**2))**(2./3.)
-        E1=(2*r*w/(w**2+w*q+q**2)+M)/d
-        s=e*np.sin(E1)
-        f0=E1-s-M
-        f1=1-e*np.cos(E1)
-        f2=s
-        f3=1-f1
-        f4=-f2
-        d3=-f0/(f1-0.5*f0*f2/f1)
-        d4=-f0/(f1+0.5*d3*f2+(d3**2)*f3/6.)
-        d5=-f0/(f1+0.5*d4*f2+d4**2*f3/6.+d4**3*f4/24.)
-        E=E1+d5
-        E[flip]=2*pi-E[flip]
-        E[M_0]=0.
-        E[M_pi]=pi
+        M,e=np.broadcast_arrays(np.asarray(M,dtype=float),np.asarray(e,dtype=float))
+        E=_KeplerMarkley(M.ravel(),e.ravel()).reshape(M.shape)
         if len1: return E[0]  #output is float
         if lst: return list(E)  #output is list
         return E
@@ -1479,9 +1819,13 @@ class ComplexFit():
         if t is None: t=self.t
         self._t0P=[t0,P]
 
-        self.epoch,self._min_type=Epoch(t,t0,P,self.dE)
+        self.epoch,self._min_type=self._Ephemeris().Epoch(t,t0,P,self.dE)
         return self.epoch
 
+    def _Baseline(self):
+        '''given linear ephemeris in epochs of data (t0+P*epoch) - calculated only once for used epoch'''
+        return self._Ephemeris().Baseline(self.epoch,self._t0P[0],self._t0P[1])
+
     def InfoGA(self,db,eps=False):
         '''statistics about GA or DE fitting'''
         info=InfoGAClass(db)
@@ -1518,17 +1862,39 @@ class ComplexFit():
         '''
 
         M=2*np.pi/P3*(t-t03)  #mean anomally
-        if e3<0.9: E=self.KeplerEQ(M,e3)   #eccentric anomally
-        else: E=self.KeplerEQMarkley(M,e3)
+        E=KeplerSolver(M,e3)   #eccentric anomally
         nu=2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2))  #true anomally
         dt=a_sin_i3*AU/c*((1-e3**2)/(1+e3*np.cos(nu))*np.sin(nu+w3)+e3*np.sin(w3))
         return dt/day
 
+    def LiTEJac(self,t,a_sin_i3,e3,w3,t03,P3):
+        '''partial derivatives of Light-Time effect (function LiTE) with respect to a_sin_i3, e3, w3, t03, P3
+        output - list of arrays in order of parameters
+        '''
+
+        M=2*np.pi/P3*(t-t03)  #mean anomally
+        E=KeplerSolver(M,e3)   #eccentric anomally
+        nu=2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2))  #true anomally
+        sq=np.sqrt(1-e3**2)
+        r=1-e3*np.cos(E)   #distance in units of semimayor axis = (1-e3**2)/(1+e3*np.cos(nu))
+        K=a_sin_i3*AU/c/day
+
+        dM=K*(e3*np.sin(E)*np.sin(nu+w3)+sq*np.cos(nu+w3))/r   #derivative with respect to mean anomally
+        dnu=np.sin(nu)*(2+e3*np.cos(nu))/(1-e3**2)   #derivative of true anomally with respect to e3 (fixed M)
+        da=AU/c/day*(r*np.sin(nu+w3)+e3*np.sin(w3))
+        de=K*((-np.cos(E)+e3*np.sin(E)**2/r)*np.sin(nu+w3)+r*np.cos(nu+w3)*dnu+np.sin(w3))
+        dw=K*(r*np.cos(nu+w3)+e3*np.cos(w3))
+        dt0=-2*np.pi/P3*dM
+        dP=-M/P3*dM
+        return [da,de,dw,dt0,dP]
+
 
 class OCFit(ComplexFit,Common):
     '''class for fitting O-C diagrams'''
-    def __init__(self,t,oc,err=None,dE=0.5):
-        '''loading times, O-Cs, (errors)'''
+    def __init__(self,t,oc,err=None,dE=0.5,backend='numpy'):
+        '''loading times, O-Cs, (errors)
+        backend - calculation of chi2 during fitting: "numpy" or "numba" (compiled kernels, numba has to be installed)
+        '''
         self.t=np.array(t)
         self.oc=np.array(oc)
         if err is None:
@@ -1557,6 +1923,8 @@ class OCFit(ComplexFit,Common):
         self.paramsMore={}      #values of parameters calculated from model params
         self.paramsMore_err={}  #errors of calculated parameters
         self.fit_params=[]      #list of fitted parameters
+        self.cov=[]             #covariance matrix of fitted parameters (from FitLM)
+        self.statsMCMC=None     #summary statistics of fitted parameters (from FitMCMC)
         self.systemParams={}    #additional parameters of the system (M1,M2,M,i3+errors)
         self._calc_err=False    #errors were calculated
         self._corr_err=False    #errors were corrected
@@ -1565,14 +1933,90 @@ class OCFit(ComplexFit,Common):
         self._t0P=[]            #linear ephemeris of binary
         self.epoch=[]           #epoch of binary
         self.res=[]             #residua = new O-C
-        self._fit=''            #used algorithm for fitting (GA/DE/MCMC)
+        self._fit=''            #used algorithm for fitting (GA/DE/LM/MCMC)
+        self.fitInfo={}         #info about fitting (e.g. reason of stopping)
         self._min_type=[]       #type of minima (primary=0 / secondary=1)
-        self.availableModels=['LiTE3','LiTE34','LiTE3Quad','LiTE34Quad',\
-                              'AgolInPlanet','AgolInPlanetLin','AgolExPlanet',\
-                              'AgolExPlanetLin','Apsidal','ApsidalQuad',\
-                              'LiTE3Apsidal','LiTE3ApsidalQuad']   #list of available models
+        self.backend=backend    #backend used for calculation of chi2
+        self._pool=None         #pool of worker processes for fitting
+        self._pool_key=None     #data used in running pool
+        self._mmap_path=None    #file with memory-mapped data (see Load)
 
 
+    @classmethod
+    def FromFile(cls,path,cols=None,delimiter=None,header=0,methods=None,method_values='err',t0=None,P=None,dE=0.5,backend='numpy'):
+        '''create class from file with observed minima (see LoadMinima)
+        t0, P - linear ephemeris (necessary if O-Cs are not given in file; epoch is calculated)
+        errors are calculated from weights (err=1/w) or from values of observing methods
+        '''
+        data=LoadMinima(path,cols,delimiter,header,methods=methods,method_values=method_values)
+        t,oc,err=_MinimaData(data,t0,P,dE)
+        if oc is None: raise TypeError('t0 and P are not given!')
+        fit=cls(t,oc,err,dE=dE,backend=backend)
+        if t0 is not None and P is not None: fit.Epoch(t0,P)
+        return fit
+
+    @property
+    def backend(self):
+        '''backend used for calculation of chi2 ("numpy" or "numba")'''
+        return self._backend
+
+    @backend.setter
+    def backend(self,backend):
+        if backend not in ['numpy','numba']:
+            raise ValueError('Unknown backend "'+backend+'"! Use "numpy" or "numba".')
+        if backend=='numba' and not kernels.available:
+            warnings.warn('Module numba not found! Using NumPy backend.')
+            backend='numpy'
+        self._backend=backend
+
+    @property
+    def availableModels(self):
+        '''list of available models (all models in registry - see RegisterModel)'''
+        return list(models)
+
+    def _Spec(self):
+        '''specification of used model from registry of models'''
+        if not self.model in models:
+            raise ValueError('The model "'+self.model+'" does not exist!')
+        return models[self.model]
+
+    def __getstate__(self):
+        '''pool of processes could not be pickled'''
+        state=dict(self.__dict__)
+        state['_pool']=None
+        state['_pool_key']=None
+        state['_ephem']=None   #cache is calculated again
+        return state
+
+    def _DataCopy(self,names):
+        '''copy of object with only data necessary for calculation of chi2 of free parameters "names" (for workers)'''
+        data=OCFit.__new__(OCFit)
+        for x in ['t','oc','err','epoch','_min_type','_t0P','dE','model','_backend']:
+            setattr(data,x,getattr(self,x))
+        data.params={p:self.params[p] for p in self.params if not p in names}   #fixed parameters
+        return data
+
+    def _StartPool(self,workers,names):
+        '''start pool of worker processes (or reuse running one) for calculation of chi2 of free parameters "names"
+        data are shipped to workers only once - pool is restarted only if data, model or fixed parameters are changed'''
+        names=list(names)
+        data=self._DataCopy(names)
+        key=pickle.dumps((workers,names,data.__dict__),protocol=2)
+        if getattr(self,'_pool',None) is not None and self._pool_key==key: return self._pool
+
+        self.ClosePool()
+        self._pool=multiprocessing.Pool(workers,initializer=_InitWorker,initargs=(data,names,self._Spec()))
+        self._pool_key=key
+        return self._pool
+
+    def ClosePool(self):
+        '''terminate pool of worker processes used for fitting (pool is kept running between fittings)'''
+        if getattr(self,'_pool',None) is not None:
+            self._pool.terminate()
+            self._pool.join()
+        self._pool=None
+        self._pool_key=None
+
     def AvailableModels(self):
         '''print available models for fitting O-Cs'''
         print('Available Models:')
@@ -1582,18 +2026,9 @@ class OCFit(ComplexFit,Common):
         '''display parameters of model'''
 
         def Display(model):
-            s=model+': '
-            if 'Quad' in model and not 'Apsidal' in model: s+='t0, P, Q, '
-            if 'Lin' in model: s+='t0, '
-            if 'LiTE' in model: s+='a_sin_i3, e3, w3, t03, P3, '
-            if '4' in model: s+='a_sin_i4, e4, w4, t04, P4, '
-            if 'InPlanet' in model: s+='P, a, w, e, mu3, r3, w3, t03, P3, '
-            if 'ExPlanet' in model: s+='P, mu3, e3, t03, P3, '
-            if 'Apsidal' in model:
-                s+='t0, P, '
-                if 'Quad' in model: s+='Q, '
-                s+='w0, dw, e, '
-            print(s[:-2])
+            if not model in models:
+                raise ValueError('The model "'+model+'" does not exist!')
+            print(model+': '+', '.join(models[model].params))
 
         if model is None: model=self.model
         if allModels:
@@ -1601,8 +2036,25 @@ class OCFit(ComplexFit,Common):
         else: Display(model)
 
 
-    def Save(self,path,format='json'):
-        '''saving data, model, parameters... to file in JSON or using PICKLE (format="json" or "pickle")'''
+    def Save(self,path,format=None):
+        '''saving data, model, parameters... to file in JSON, using PICKLE or in binary format (format="json", "pickle" or "npz")
+        binary format - data arrays in npz file (zip with uncompressed .npy files), other values in JSON header;
+        fast loading of large datasets (could be memory-mapped - see Load)
+        default format - "npz" for files with extension ".npz", otherwise "json"
+        note: data memory-mapped from the same file (see Load) are copied to RAM before saving
+        (mapped file could not be replaced, e.g. on Windows); other references to mapped arrays keep file open
+        '''
+        path=path.replace('\\','/')   #change dirs in path (for Windows)
+        if format is None:
+            if path.endswith('.npz'): format='npz'
+            else: format='json'
+        if path.rfind('.')<=path.rfind('/'):
+            #without extesion
+            if format=='npz': path+='.npz'
+            else: path+='.json'
+
+        if getattr(self,'_mmap_path',None) is not None and os.path.abspath(path)==self._mmap_path: self._Unmap()
+
         data={}
         data['t']=self.t
         data['oc']=self.oc
@@ -1627,9 +2079,12 @@ class OCFit(ComplexFit,Common):
         data['dE']=self.dE
         data['system']=self.systemParams
 
-        path=path.replace('\\','/')   #change dirs in path (for Windows)
-        if path.rfind('.')<=path.rfind('/'): path+='.json'   #without extesion
-
+        if format=='npz':
+            arrays={}
+            for x in ['t','oc','err','order','old_err','epoch','min_type']:
+                arrays[x]=np.asarray(data.pop(x))
+            SaveArrays(path,arrays,data,cls=_NumpyEncoder)
+            return
         if format=='pickle':
             f=open(path,'wb')
             pickle.dump(data,f,protocol=2)
@@ -1638,30 +2093,52 @@ class OCFit(ComplexFit,Common):
             f=open(path,'w')
             json.dump(data,f,cls=_NumpyEncoder)
             f.close()
-        else: raise Exception('Unknown file format '+format+'! Use "json" or "pickle".')
+        else: raise Exception('Unknown file format '+format+'! Use "json", "pickle" or "npz".')
         f.close()
 
-    def Load(self,path):
-        '''loading data, model, parameters... from file'''
+    def _Unmap(self):
+        '''copy memory-mapped data arrays to RAM -> mapped file is closed'''
+        if getattr(self,'_mmap_path',None) is None: return
+        for x in ['t','oc','err','_order','_old_err','epoch','_min_type']:
+            setattr(self,x,np.array(getattr(self,x)))
+        self._Ephemeris().Clear()   #cache could keep mapped arrays
+        self._mmap_path=None
+
+    def Load(self,path,mmap=False):
+        '''loading data, model, parameters... from file
+        mmap - data arrays from binary file (npz) are memory-mapped (not read to RAM);
+               file is mapped until data are saved to it (see Save) or another file is loaded
+        '''
         path=path.replace('\\','/')   #change dirs in path (for Windows)
-        if path.rfind('.')<=path.rfind('/'): path+='.json'   #without extesion
-        f=open(path,'rb')  #detect if file is json or pickle
-        x=f.read(1)
-        f.close()
+        if path.rfind('.')<=path.rfind('/'):
+            #without extesion
+            if os.path.isfile(path+'.npz') and not os.path.isfile(path+'.json'): path+='.npz'
+            else: path+='.json'
+
+        self._Unmap()   #data from previous file
+        if IsArrays(path):
+            #binary format
+            data,arrays=LoadArrays(path,mmap)
+            data.update(arrays)
+            if mmap: self._mmap_path=os.path.abspath(path)
+        else:
+            f=open(path,'rb')  #detect if file is json or pickle
+            x=f.read(1)
+            f.close()
 
-        f=open(path,'rb')
-        if x==b'{': data=json.load(f)
-        else: data=pickle.load(f,encoding='latin1')
-        f.close()
+            f=open(path,'rb')
+            if x==b'{': data=json.load(f)
+            else: data=pickle.load(f,encoding='latin1')
+            f.close()
 
-        self.t=np.array(data['t'])
-        self.oc=np.array(data['oc'])
-        self.err=np.array(data['err'])
-        self._order=np.array(data['order'])
+        self.t=np.asarray(data['t'])
+        self.oc=np.asarray(data['oc'])
+        self.err=np.asarray(data['err'])
+        self._order=np.asarray(data['order'])
         self._set_err=data['set_err']
         self._corr_err=data['corr_err']
         self._calc_err=data['calc_err']
-        self._old_err=np.array(data['old_err'])
+        self._old_err=np.asarray(data['old_err'])
         self.limits=data['limits']
         self.steps=data['steps']
         self.params=data['params']
@@ -1671,8 +2148,8 @@ class OCFit(ComplexFit,Common):
         self.fit_params=data['fit_params']
         self.model=data['model']
         self._t0P=data['t0P']
-        self.epoch=np.array(data['epoch'])
-        self._min_type=np.array(data['min_type'])
+        self.epoch=np.asarray(data['epoch'])
+        self._min_type=np.asarray(data['min_type'])
 
         if 'fit' in data: self._fit=data['fit']
         elif len(self.params_err)==0: self._fit='GA'
@@ -1722,7 +2199,7 @@ class OCFit(ComplexFit,Common):
 
         if not len(self.epoch)==len(t):
             raise NameError('Epoch not callculated! Run function "Epoch" before it.')
-        dt=t0+P*self.epoch-(self._t0P[0]+self._t0P[1]*self.epoch) #linear model
+        dt=t0+P*self.epoch-self._Baseline() #linear model
 
         dt3=self.AgolInPlanet(t,P,a,w,e,mu3,r3,w3,t03,P3)  #AgolInPlanet model
         return dt+dt3
@@ -1738,14 +2215,9 @@ class OCFit(ComplexFit,Common):
         output in days
         '''
 
-        M=2*np.pi/P3*(t-t03)
-        while (M>2*np.pi).any(): M[np.where(M>2*np.pi)]-=2*np.pi
-        while (M<0).any(): M[np.where(M<0)]+=2*np.pi
-        if e3<0.9: E=self.KeplerEQ(M,e3)
-        else: E=self.KeplerEQMarkley(M,e3)
-        nu=2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2))
-        while (nu>2*np.pi).any(): nu[np.where(nu>2*np.pi)]-=2*np.pi
-        while (nu<0).any(): nu[np.where(nu<0)]+=2*np.pi
+        M=np.mod(2*np.pi/P3*(t-t03),2*np.pi)
+        E=KeplerSolver(M,e3)
+        nu=np.mod(2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2)),2*np.pi)
         dt=mu3/(2*np.pi*(1-mu3))*P**2/P3*(1-e3**2)**(-3./2.)*(nu-M+e3*np.sin(nu))
         return dt
 
@@ -1766,7 +2238,116 @@ class OCFit(ComplexFit,Common):
         dt=t0+P*self.epoch
 
         dt3=self.AgolExPlanet(t,P,mu3,e3,t03,P3)
-        return dt+dt3-(self._t0P[0]+self._t0P[1]*self.epoch)
+        return dt+dt3-self._Baseline()
+
+    def _LinJac(self,t,Q=False):
+        '''partial derivatives of linear (quadratic) ephemeris with respect to t0, P, (Q)'''
+        if not len(self.epoch)==len(t):
+            raise NameError('Epoch not callculated! Run function "Epoch" before it.')
+        if Q: return [np.ones(self.epoch.shape),self.epoch,self.epoch**2]
+        return [np.ones(self.epoch.shape),self.epoch]
+
+    def AgolInPlanetJac(self,t,P,a,w,e,mu3,r3,w3,t03,P3):
+        '''partial derivatives of model AgolInPlanet with respect to P, a, w, e, mu3, r3, w3, t03, P3'''
+        nu=2*np.pi/P3*(t-t03)
+        D=2*np.pi*a*(1-e*np.sin(w))
+        sq=np.sqrt(1-e**2)
+        dt=-P*mu3*r3*np.cos(nu+w3)*sq/D
+
+        dP=-mu3*r3*np.cos(nu+w3)*sq/D
+        da=-dt/a
+        dw=dt*e*np.cos(w)/(1-e*np.sin(w))
+        de=dt*(np.sin(w)/(1-e*np.sin(w))-e/(1-e**2))
+        dmu=-P*r3*np.cos(nu+w3)*sq/D
+        dr=-P*mu3*np.cos(nu+w3)*sq/D
+        dw3=P*mu3*r3*np.sin(nu+w3)*sq/D
+        dt0=-2*np.pi/P3*dw3
+        dP3=-nu/P3*dw3
+        return [dP,da,dw,de,dmu,dr,dw3,dt0,dP3]
+
+    def AgolInPlanetLinJac(self,t,t0,P,a,w,e,mu3,r3,w3,t03,P3):
+        '''partial derivatives of model AgolInPlanetLin with respect to t0, P, a, w, e, mu3, r3, w3, t03, P3'''
+        lin=self._LinJac(t)
+        der=self.AgolInPlanetJac(t,P,a,w,e,mu3,r3,w3,t03,P3)
+        return [lin[0],lin[1]+der[0]]+der[1:]
+
+    def AgolExPlanetJac(self,t,P,mu3,e3,t03,P3):
+        '''partial derivatives of model AgolExPlanet with respect to P, mu3, e3, t03, P3'''
+        M=np.mod(2*np.pi/P3*(t-t03),2*np.pi)
+        E=KeplerSolver(M,e3)
+        nu=np.mod(2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2)),2*np.pi)
+        h=nu-M+e3*np.sin(nu)
+        K=mu3/(2*np.pi*(1-mu3))*P**2/P3*(1-e3**2)**(-3./2.)
+
+        hM=(1+e3*np.cos(nu))**3/(1-e3**2)**(3./2.)-1   #derivative of h with respect to mean anomally
+        he=np.sin(nu)*(2+e3*np.cos(nu))*(1+e3*np.cos(nu))/(1-e3**2)+np.sin(nu)   #derivative of h with respect to e3 (fixed M)
+        dP=mu3/(2*np.pi*(1-mu3))*2*P/P3*(1-e3**2)**(-3./2.)*h
+        dmu=1/(2*np.pi*(1-mu3)**2)*P**2/P3*(1-e3**2)**(-3./2.)*h
+        de=K*(3*e3/(1-e3**2)*h+he)
+        dt0=-2*np.pi/P3*K*hM
+        dP3=-K*h/P3-2*np.pi*(t-t03)/P3**2*K*hM
+        return [dP,dmu,de,dt0,dP3]
+
+    def AgolExPlanetLinJac(self,t,t0,P,mu3,e3,t03,P3):
+        '''partial derivatives of model AgolExPlanetLin with respect to t0, P, mu3, e3, t03, P3'''
+        lin=self._LinJac(t)
+        der=self.AgolExPlanetJac(t,P,mu3,e3,t03,P3)
+        return [lin[0],lin[1]+der[0]]+der[1:]
+
+    def LiTE3Jac(self,t,a_sin_i3,e3,w3,t03,P3):
+        '''partial derivatives of model LiTE3 with respect to a_sin_i3, e3, w3, t03, P3'''
+        return self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)
+
+    def LiTE34Jac(self,t,a_sin_i3,e3,w3,t03,P3,a_sin_i4,e4,w4,t04,P4):
+        '''partial derivatives of model LiTE34 with respect to a_sin_i3, e3, w3, t03, P3, a_sin_i4, e4, w4, t04, P4'''
+        return self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)+self.LiTEJac(t,a_sin_i4,e4,w4,t04,P4)
+
+    def LiTE3QuadJac(self,t,t0,P,Q,a_sin_i3,e3,w3,t03,P3):
+        '''partial derivatives of model LiTE3Quad with respect to t0, P, Q, a_sin_i3, e3, w3, t03, P3'''
+        return self._LinJac(t,Q=True)+self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)
+
+    def LiTE34QuadJac(self,t,t0,P,Q,a_sin_i3,e3,w3,t03,P3,a_sin_i4,e4,w4,t04,P4):
+        '''partial derivatives of model LiTE34Quad with respect to t0, P, Q, a_sin_i3, e3, w3, t03, P3, a_sin_i4, e4, w4, t04, P4'''
+        return self._LinJac(t,Q=True)+self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)+self.LiTEJac(t,a_sin_i4,e4,w4,t04,P4)
+
+    def ApsidalJac(self,t,t0,P,w0,dw,e,min_type):
+        '''partial derivatives of model Apsidal with respect to t0, P, w0, dw, e'''
+        lin=self._LinJac(t)
+
+        w=w0+dw*self.epoch   #position of pericenter
+        nu=-w+np.pi/2       #true anomaly
+        sq=np.sqrt(1-e**2)
+        b=e/(1+sq)
+        db=1/(sq*(1+sq))   #derivative of b with respect to e
+
+        sign=np.where(min_type==1,-1,1)   #sign of odd terms for secondary minima
+        s=0
+        snu=0
+        se=0
+        for n in range(1,10):
+            k=sign**n
+            s+=k*(-b)**n*(1/n+sq)*np.sin(n*nu)
+            snu+=k*(-b)**n*(1/n+sq)*n*np.cos(n*nu)
+            se+=k*(-n*(-b)**(n-1)*db*(1/n+sq)-(-b)**n*e/sq)*np.sin(n*nu)
+
+        dP=s/np.pi+lin[1]
+        dw0=-P/np.pi*snu
+        ddw=dw0*self.epoch
+        de=P/np.pi*se
+        return [lin[0],dP,dw0,ddw,de]
+
+    def ApsidalQuadJac(self,t,t0,P,Q,w0,dw,e,min_type):
+        '''partial derivatives of model ApsidalQuad with respect to t0, P, Q, w0, dw, e'''
+        der=self.ApsidalJac(t,t0,P,w0,dw,e,min_type)
+        return der[:2]+[self.epoch**2]+der[2:]
+
+    def LiTE3ApsidalJac(self,t,a_sin_i3,e3,w3,t03,P3,t0,P,w0,dw,e,min_type):
+        '''partial derivatives of model LiTE3Apsidal with respect to a_sin_i3, e3, w3, t03, P3, t0, P, w0, dw, e'''
+        return self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)+self.ApsidalJac(t,t0,P,w0,dw,e,min_type)
+
+    def LiTE3ApsidalQuadJac(self,t,a_sin_i3,e3,w3,t03,P3,t0,P,Q,w0,dw,e,min_type):
+        '''partial derivatives of model LiTE3ApsidalQuad with respect to a_sin_i3, e3, w3, t03, P3, t0, P, Q, w0, dw, e'''
+        return self.LiTEJac(t,a_sin_i3,e3,w3,t03,P3)+self.ApsidalQuadJac(t,t0,P,Q,w0,dw,e,min_type)
 
     def LiTE3(self,t,a_sin_i3,e3,w3,t03,P3):
         '''model of O-C by Light-Time effect caused by 3rd body given by Irwin (1952)
@@ -1817,7 +2398,7 @@ class OCFit(ComplexFit,Common):
         dt=t0+P*self.epoch+Q*self.epoch**2
 
         dt3=self.LiTE(t,a_sin_i3,e3,w3,t03,P3)
-        return dt+dt3-(self._t0P[0]+self._t0P[1]*self.epoch)
+        return dt+dt3-self._Baseline()
 
 
     def LiTE34Quad(self,t,t0,P,Q,a_sin_i3,e3,w3,t03,P3,a_sin_i4,e4,w4,t04,P4):
@@ -1841,7 +2422,7 @@ class OCFit(ComplexFit,Common):
 
         dt3=self.LiTE(t,a_sin_i3,e3,w3,t03,P3)
         dt4=self.LiTE(t,a_sin_i4,e4,w4,t04,P4)
-        return dt+dt3+dt4-(self._t0P[0]+self._t0P[1]*self.epoch)
+        return dt+dt3+dt4-self._Baseline()
 
     def Apsidal(self,t,t0,P,w0,dw,e,min_type):
         '''Apsidal motion on O-C diagram (Gimenez&Bastero,1995)
@@ -1876,11 +2457,9 @@ class OCFit(ComplexFit,Common):
         oc1=P/np.pi*sum1
         oc2=P/np.pi*sum2
 
-        dt=np.zeros(t.shape)
-        dt[np.where(min_type==0)]=oc1[np.where(min_type==0)]  #primary
-        dt[np.where(min_type==1)]=oc2[np.where(min_type==1)]  #secondary
+        dt=np.where(min_type==1,oc2,oc1)  #primary / secondary
 
-        return dt+(t0+P*self.epoch)-(self._t0P[0]+self._t0P[1]*self.epoch)
+        return dt+(t0+P*self.epoch)-self._Baseline()
 
     def ApsidalQuad(self,t,t0,P,Q,w0,dw,e,min_type):
         '''Apsidal motion on O-C diagram (Gimenez&Bastero,1995) with quadratic model
@@ -1960,11 +2539,71 @@ class OCFit(ComplexFit,Common):
         for x in self.params:
             #add fixed parameters
             if not x in param: param[x]=self.params[x]
+        spec=self._Spec()
+        if self._backend=='numba' and spec.kernel is not None:
+            return self._Chi2Kernel(spec.kernel,param,np.zeros((1,0)),[])[0]
         model=self.Model(param=param)   #calculate model
         return np.sum(((model-self.oc)/self.err)**2)
 
+    def _Chi2Kernel(self,kernel,param,values,names):
+        '''calculate chi2 errors using compiled kernel
+        kernel - (id of model, order of parameters, epoch is necessary)
+        param - dict with values of other parameters; values - matrix of values of parameters "names"'''
+        model,order,use_epoch=kernel
+        if use_epoch and not len(self.epoch)==len(self.t):
+            raise NameError('Epoch not callculated! Run function "Epoch" before it.')
+        #matrix of all parameters of model in order required by kernel
+        pars=np.empty((values.shape[0],len(order)))
+        for i,p in enumerate(order):
+            if p in names: pars[:,i]=values[:,names.index(p)]
+            else: pars[:,i]=param[p]
+        if len(self.epoch)==len(self.t):
+            epoch=np.asarray(self.epoch,dtype=float)
+            t0L,PL=self._t0P
+        else:
+            epoch=np.zeros(self.t.shape)
+            t0L,PL=0.,0.
+        if len(self._min_type)==len(self.t): min_type=np.asarray(self._min_type,dtype=float)
+        else: min_type=np.zeros(self.t.shape)
+        return kernels.Chi2(model,pars,np.asarray(self.t,dtype=float),epoch,min_type,float(t0L),float(PL),
+                            np.asarray(self.oc,dtype=float),np.asarray(self.err,dtype=float))
+
+    def _Chi2Func(self,names=None):
+        '''resolve used model only once (before fitting) -> function calculating chi2 errors for matrix of values
+        names - list of free parameters (columns of matrix), default "fit_params"; other parameters are fixed to "params"
+        '''
+        if names is None: names=self.fit_params
+        names=list(names)
+        spec=self._Spec()
+        if self._backend=='numba' and spec.kernel is not None:
+            param=dict(self.params)   #fixed parameters
+            return lambda values: self._Chi2Kernel(spec.kernel,param,np.atleast_2d(np.array(values,dtype=float)),names)
+
+        evaluate=spec.Bind(self,names)   #model as function of flat array of free parameters
+        oc=self.oc
+        err=self.err
+        n=max(1,int(batch_size/len(self.t)))   #number of individuals calculated at once
+
+        def chi2(values):
+            values=np.atleast_2d(np.array(values,dtype=float))
+            out=np.zeros(values.shape[0])
+            for i in range(0,values.shape[0],n):
+                #model is broadcasted to matrix (individuals x data points)
+                out[i:i+n]=np.sum(((evaluate(values[i:i+n])-oc)/err)**2,axis=-1)
+            return out
+
+        return chi2
+
+    def Chi2Batch(self,params):
+        '''calculate chi2 errors for whole population (or set of walkers) at once
+        params - matrix of values of fitted parameters; one row = one individual, columns in order given by "fit_params"
+        output - np.array of chi2 errors of all individuals
+        '''
+        return self._Chi2Func()(params)
+
     def FitGA(self,generation,size,mut=0.5,SP=2,plot_graph=False,visible=True,
-              n_thread=1,db=None):
+              n_thread=1,db=None,workers=1,stall=None,tol=None,max_time=None,elite=0,memetic=0,memetic_n=1,memetic_nfev=None,
+              seed=None,callback=None):
         '''fitting with Genetic Algorithms
         generation - number of generations - should be approx. 100-200 x number of free parameters
         size - number of individuals in one generation (size of population) - should be approx. 100-200 x number of free parameters
@@ -1974,34 +2613,46 @@ class OCFit(ComplexFit,Common):
         visible - display status of fitting
         n_thread - number of threads for multithreading
         db - name of database to save GA fitting details (could be analysed later using InfoGA function)
+        workers - number of processes for multiprocessing (pool is kept running for next fittings, see ClosePool)
+        stall - stop fitting if global best solution was not improved for given number of generations
+        tol - stop fitting if spread of chi2 in population is small: std(chi2) <= tol*mean(chi2)
+        max_time - max. time of fitting in seconds
+        elite - number of best individuals copied unchanged to next generation (elitism)
+        memetic - every "memetic" generations the best individuals are refined by local fitting (see FitLM)
+        memetic_n - number of refined individuals
+        memetic_nfev - max. number of evaluations of model for one local fitting (default given by scipy)
+        seed - seed (or np.random.Generator) for reproducible fitting (default - from global numpy random state)
+        callback - function called with progress of fitting (dict) after each generation; fitting is stopped if it returns True
+        number of used generations and reason of stopping are in "fitInfo"
         '''
 
         def Thread(subpopul):
             #thread's function for multithreading
-            for i in subpopul: objfun[i]=self.Chi2(popul.p[i])
+            objfun[subpopul]=chi2(values[subpopul])
+
+        chi2=self._Chi2Func()   #objective function - model is resolved only once
+        if workers>1: pool=self._StartPool(workers,self.fit_params)
 
         limits=self.limits
         steps=self.steps
 
-        popul=TPopul(size,self.fit_params,mut,steps,limits,SP)  #init GA Class
+        popul=TPopul(size,self.fit_params,mut,steps,limits,SP,elite,seed)  #init GA Class
+        if memetic>0:
+            #local fitting of best individuals inside limits
+            Residua,jac=self._Residua(self.fit_params)
+            bounds=(popul.lower,popul.upper)
         min0=1e15  #large number for comparing -> for finding min. value
         p={}     #best set of parameters
         if plot_graph:
             graph=[]
             graph_mean=[]
 
-        objfun=[]   #values of Objective Function
-        for i in range(size): objfun.append(0)
+        objfun=np.zeros(size)   #values of Objective Function
 
         if db is not None:
-            #saving GA fitting details
-            save_dat={}
-            save_dat['chi2']=[]
-            for par in self.fit_params: save_dat[par]=[]
-            path=db.replace('\\','/')   #change dirs in path (for Windows)
-            if path.rfind('/')>0:
-                path=path[:path.rfind('/')+1]  #find current dir of db file
-                if not os.path.isdir(path): os.mkdir(path) #create dir of db file, if not exist
+            #saving GA fitting details - continuously during fitting
+            save_dat=TraceDB(db,mode='r+')
+            save_dat.Create(self.fit_params,size,generation)
 
         if not visible:
             #hidden output
@@ -2009,36 +2660,60 @@ class OCFit(ComplexFit,Common):
             out=sys.stdout
             sys.stdout=f
 
+        stop='generation'   #reason of stopping
+        last=0   #generation with last improvement of global best solution
+        n_gen=0  #number of finished generations
         tic=time()
         for gen in range(generation):
             #main loop of GA
             threads=[]
             sys.stdout.write('Genetic Algorithms: '+str(gen+1)+' / '+str(generation)+' generations in '+str(np.round(time()-tic,1))+' sec  ')
             sys.stdout.flush()
-            for t in range(n_thread):
-                #multithreading
-                threads.append(threading.Thread(target=Thread,args=[list(range(int(t*size/float(n_thread)),
-                                                                          int((t+1)*size/float(n_thread))))]))
-            #waiting for all threads and joining them
-            for t in threads: t.start()
-            for t in threads: t.join()
+            values=popul.p   #whole population as matrix
+            if workers>1:
+                #multiprocessing - only matrix of parameters is sent to workers
+                objfun[:]=np.concatenate(pool.map(_WorkerChi2,np.array_split(values,workers)))
+            elif n_thread>1:
+                for t in range(n_thread):
+                    #multithreading
+                    threads.append(threading.Thread(target=Thread,args=[list(range(int(t*size/float(n_thread)),
+                                                                              int((t+1)*size/float(n_thread))))]))
+                #waiting for all threads and joining them
+                for t in threads: t.start()
+                for t in threads: t.join()
+            else: Thread(list(range(size)))
+
+            if memetic>0 and (gen+1)%memetic==0:
+                #refinement of best individuals by local fitting (memetic algorithm)
+                for j in np.argsort(objfun)[:memetic_n]:
+                    res=least_squares(Residua,popul.p[j],jac=jac,method='trf',bounds=bounds,x_scale='jac',max_nfev=memetic_nfev)
+                    if 2*res.cost<objfun[j]:
+                        popul.p[j]=res.x
+                        objfun[j]=2*res.cost
 
             #finding best solution in population and compare with global best solution
             i=np.argmin(objfun)
             if objfun[i]<min0:
                 min0=objfun[i]
-                p=dict(popul.p[i])
+                p=dict(zip(self.fit_params,popul.p[i]))
+                last=gen
 
             if plot_graph:
                 graph.append(min0)
                 graph_mean.append(np.mean(np.array(objfun)))
 
-            if db is not None:
-                save_dat['chi2'].append(list(objfun))
-                for par in self.fit_params:
-                    temp=[]
-                    for x in popul.p: temp.append(x[par])
-                    save_dat[par].append(temp)
+            if db is not None: save_dat.Append(objfun,popul.p)
+            n_gen=gen+1
+
+            #stopping rules
+            if stall is not None and gen-last>=stall: stop='stall'
+            elif tol is not None and np.std(objfun)<=tol*np.abs(np.mean(objfun)): stop='tol'
+            elif max_time is not None and time()-tic>max_time: stop='max_time'
+            elif callback is not None and callback({'method':'GA','generation':gen+1,'generations':generation,
+                                                    'chi2':min0,'time':time()-tic}): stop='callback'
+            if not stop=='generation':
+                sys.stdout.write('\r')
+                break
 
             popul.Next(objfun)  #generate new generation
             sys.stdout.write('\r')
@@ -2058,12 +2733,7 @@ class OCFit(ComplexFit,Common):
             mpl.plot(graph_mean,'--')
             mpl.legend(['Best solution',r'Mean $\chi^2$ in generation'])
 
-        if db is not None:
-            #saving GA fitting details to file
-            for x in save_dat: save_dat[x]=np.array(save_dat[x])
-            f=open(db,'wb')
-            pickle.dump(save_dat,f,protocol=2)
-            f.close()
+        if db is not None: save_dat.Flush()   #saving rest of GA fitting details to file
 
         for param in p: self.params[param]=p[param]   #save found parameters
         self.params_err={}   #remove errors of parameters
@@ -2071,10 +2741,11 @@ class OCFit(ComplexFit,Common):
         self.paramsMore={}
         self.paramsMore_err={}
         self._fit='GA'
+        self.fitInfo={'stop':stop,'generations':n_gen,'chi2':min0,'time':time()-tic}
 
         return self.params
 
-    def FitDE(self,generation,size,plot_graph=False,visible=True,strategy='randtobest1bin',tol=0.01,mutation=(0.5, 1),recombination=0.7,workers=1,db=None):
+    def FitDE(self,generation,size,plot_graph=False,visible=True,strategy='randtobest1bin',tol=0.01,mutation=(0.5, 1),recombination=0.7,workers=1,db=None,seed=None,callback=None):
         '''fitting with Differential Evolution
         generation - number of generations - should be approx. 100-200 x number of free parameters
         size - number of individuals in one generation (size of population) - should be approx. 100-200 x number of free parameters
@@ -2084,8 +2755,10 @@ class OCFit(ComplexFit,Common):
         tol - relative tolerance for convergence
         mutation - mutation constant
         recombination - recombination constant (crossover probability)
-        workers - number of walkers for multiprocessing
+        workers - number of processes for multiprocessing (pool is kept running for next fittings, see ClosePool)
         db - name of database to save DE fitting details (could be analysed later using InfoGA function)
+        seed - seed (or np.random.Generator) for reproducible fitting (default - from global numpy random state)
+        callback - function called with progress of fitting (dict) after each generation; fitting is stopped if it returns True
         '''
 
         limits=[]
@@ -2096,27 +2769,32 @@ class OCFit(ComplexFit,Common):
             graph_mean=[]
 
         def ObjFun(vals,*names):
-            '''Objective Function for DE'''
-            pp={n:v for n,v in zip(names,vals)}
-            return self.Chi2(pp)
+            '''vectorized Objective Function for DE - vals has shape (number of params, number of individuals)'''
+            if workers>1:
+                #multiprocessing - population is split between workers
+                return np.concatenate(pool.map(_WorkerChi2,np.array_split(vals.T,workers)))
+            return chi2(vals.T)
+
+        if workers>1: pool=self._StartPool(workers,self.fit_params)
+        else: chi2=self._Chi2Func()   #model is resolved only once
 
         if db is not None:
-            #saving DE fitting details
-            save_dat={}
-            save_dat['chi2']=[]
-            for par in self.fit_params: save_dat[par]=[]
-            path=db.replace('\\','/')   #change dirs in path (for Windows)
-            if path.rfind('/')>0:
-                path=path[:path.rfind('/')+1]  #find current dir of db file
-                if not os.path.isdir(path): os.mkdir(path) #create dir of db file, if not exist
+            #saving DE fitting details - continuously during fitting
+            save_dat=TraceDB(db,mode='r+')
 
-        solver=DifferentialEvolutionSolver(ObjFun,bounds=limits,args=self.fit_params,maxiter=generation,popsize=size,disp=visible,strategy=strategy,tol=tol,mutation=mutation,recombination=recombination,workers=workers)
+        solver=_DESolver(ObjFun,limits,RandomGenerator(seed),args=self.fit_params,maxiter=generation,popsize=size,disp=visible,strategy=strategy,tol=tol,mutation=mutation,recombination=recombination,vectorized=True)
         solver.init_population_lhs()
+        if db is not None: save_dat.Create(self.fit_params,solver.num_population_members,generation)
+        lower=np.array([l[0] for l in limits])
+        width=np.array([l[1]-l[0] for l in limits])
 
+        stop='generation'   #reason of stopping
+        n_gen=0  #number of finished generations
         tic=time()
         for gen in range(generation):
             #main loop of DE
             solver.__next__()
+            n_gen=gen+1
 
             if solver.disp:
                 sys.stdout.write('differential_evolution step %d: f(x)= %g in %.1f sec  ' % (gen+1,solver.population_energies[0],time()-tic))
@@ -2126,16 +2804,19 @@ class OCFit(ComplexFit,Common):
                 graph.append(np.min(solver.population_energies))
                 graph_mean.append(np.mean(solver.population_energies))
 
-            if db is not None:
-                save_dat['chi2'].append(list(solver.population_energies))
-                for i,par in enumerate(self.fit_params):
-                    save_dat[par].append(list(solver.population[:,i]*(limits[i][1]-limits[i][0])+limits[i][0]))
+            if db is not None: save_dat.Append(solver.population_energies,solver.population*width+lower)
 
             if solver.disp:
                 sys.stdout.write('\r')
                 sys.stdout.flush()
 
-            if solver.converged(): break
+            if solver.converged():
+                stop='tol'
+                break
+            if callback is not None and callback({'method':'DE','generation':gen+1,'generations':generation,
+                                                  'chi2':solver.population_energies[0],'time':time()-tic}):
+                stop='callback'
+                break
 
         if visible: sys.stdout.write('\n')
 
@@ -2147,12 +2828,7 @@ class OCFit(ComplexFit,Common):
             mpl.plot(graph_mean,'--')
             mpl.legend(['Best solution',r'Mean $\chi^2$ in generation'])
 
-        if db is not None:
-            #saving DE fitting details to file
-            for x in save_dat: save_dat[x]=np.array(save_dat[x])
-            f=open(db,'wb')
-            pickle.dump(save_dat,f,protocol=2)
-            f.close()
+        if db is not None: save_dat.Flush()   #saving rest of DE fitting details to file
 
         for i,p in enumerate(self.fit_params): self.params[p]=solver.x[i]   #save found parameters
         self.params_err={}   #remove errors of parameters
@@ -2160,10 +2836,151 @@ class OCFit(ComplexFit,Common):
         self.paramsMore={}
         self.paramsMore_err={}
         self._fit='DE'
+        self.fitInfo={'stop':stop,'generations':n_gen,'chi2':solver.population_energies[0],'time':time()-tic}
+
+        return self.params
+
+    def FitIslands(self,generation,size,islands=4,method='GA',migration=10,migrants=1,workers=1,visible=True,
+                   mut=0.5,SP=2,elite=0,strategy='randtobest1bin',mutation=(0.5,1),recombination=0.7,seed=None,callback=None):
+        '''fitting with island model - several independent populations of GA or DE (islands) with periodic migration
+        of best individuals from each island to next one (ring topology)
+        generation - number of generations
+        size - size of population on one island (for DE - multiplier of number of free parameters, as in FitDE)
+        islands - number of islands
+        method - "GA" or "DE"
+        migration - number of generations between migrations
+        migrants - number of best individuals sent to next island in migration
+        workers - number of processes - islands are run in parallel (pool is kept running for next fittings, see ClosePool)
+        visible - display status of fitting
+        mut, SP, elite - settings of GA (see FitGA)
+        strategy, mutation, recombination - settings of DE (see FitDE)
+        seed - seed (or np.random.Generator) - independent random streams of islands are spawned from it
+        callback - function called with progress of fitting (dict) after each migration; fitting is stopped if it returns True
+        best solution on each island and its history are in "fitInfo"
+        '''
+        if not method in ['GA','DE']: raise ValueError('Unknown method "'+method+'"! Use "GA" or "DE".')
+        lower=np.array([self.limits[p][0] for p in self.fit_params],dtype=float)
+        width=np.array([self.limits[p][1]-self.limits[p][0] for p in self.fit_params],dtype=float)
+
+        #independent random stream for each island
+        rngs=SpawnGenerators(seed,islands)
+        isl=[]
+        for i in range(islands):
+            island={'method':method,'n_migr':int(migrants),'chi2':np.inf,'x':None,'history':[],'migrants':None,'rng':rngs[i]}
+            if method=='GA': island['popul']=TPopul(size,self.fit_params,mut,self.steps,self.limits,SP,elite,rngs[i])
+            else:
+                island['popul']=None
+                island['size']=size
+                island['bounds']=(lower,width)
+                island['settings']={'strategy':strategy,'mutation':mutation,'recombination':recombination}
+            isl.append(island)
+
+        if workers>1: pool=self._StartPool(workers,self.fit_params)
+        else: chi2=self._Chi2Func()
+
+        stop='generation'   #reason of stopping
+        tic=time()
+        gen=0
+        while gen<generation:
+            n=min(migration,generation-gen)
+            if workers>1: isl=pool.map(_WorkerIsland,[(island,n) for island in isl])
+            else: isl=[_IslandEpoch(chi2,island,n) for island in isl]
+            gen+=n
+            best=min(island['chi2'] for island in isl)
+            if visible:
+                sys.stdout.write('Island model: '+str(gen)+' / '+str(generation)+' generations, chi2 = '+str(best)+
+                                 ' in '+str(np.round(time()-tic,1))+' sec  \r')
+                sys.stdout.flush()
+            if callback is not None and callback({'method':method,'generation':gen,'generations':generation,
+                                                  'chi2':best,'time':time()-tic}):
+                if gen<generation: stop='callback'
+                break
+            if gen<generation and islands>1:
+                #migration - best individuals replace worst (or random) individuals of next island
+                migr=[island['migrants'] for island in isl]
+                for i,island in enumerate(isl):
+                    if method=='GA': island['popul'].p[-migrants:]=migr[i-1]
+                    else: island['popul'][-migrants:]=migr[i-1]
+        if visible: sys.stdout.write('\n')
+
+        i=int(np.argmin([island['chi2'] for island in isl]))
+        for j,p in enumerate(self.fit_params): self.params[p]=isl[i]['x'][j]   #save found parameters
+        self.params_err={}   #remove errors of parameters
+        #remove some values calculated from old parameters
+        self.paramsMore={}
+        self.paramsMore_err={}
+        self._fit=method
+        self.fitInfo={'stop':stop,'generations':gen,'best':i,'chi2':isl[i]['chi2'],'time':time()-tic,
+                      'islands':[{'chi2':island['chi2'],'params':dict(zip(self.fit_params,island['x'])),
+                                  'history':np.array(island['history'])} for island in isl]}
 
         return self.params
 
-    def FitMCMC(self,n_iter,burn=0,binn=1,walkers=0,visible=True,db=None):
+    def _Residua(self,names):
+        '''weighted residua and their derivatives as functions of flat array of free parameters "names" (for least_squares)'''
+        spec=self._Spec()
+        evaluate=spec.Bind(self,names)   #model as function of flat array of free parameters
+
+        def Residua(values):
+            '''weighted residua'''
+            return (evaluate(values)-self.oc)/self.err
+
+        if spec.jac is None: jac='2-point'   #numerical derivatives
+        else:
+            der=spec.BindJac(self,names)
+            def jac(values):
+                '''derivatives of weighted residua'''
+                return der(values)/self.err[:,np.newaxis]
+        return Residua,jac
+
+    def FitLM(self,max_nfev=None,method='lm',visible=True):
+        '''local fitting with Levenberg-Marquardt method starting from current values of parameters
+        (e.g. found by GA or DE); analytic derivatives of model are used (if available)
+        max_nfev - max. number of evaluations of model (default given by scipy)
+        method - "lm" (Levenberg-Marquardt, limits of parameters are not used) or "trf" (with limits as bounds)
+        visible - display status of fitting
+        output - values of parameters, errors of parameters and covariance matrix (in order given by "fit_params")
+        '''
+
+        names=list(self.fit_params)
+        Residua,jac=self._Residua(names)
+
+        x0=np.array([self.params[p] for p in names],dtype=float)
+        if method=='lm': bounds=(-np.inf,np.inf)
+        else:
+            bounds=([self.limits[p][0] for p in names],[self.limits[p][1] for p in names])
+            x0=np.clip(x0,bounds[0],bounds[1])
+        res=least_squares(Residua,x0,jac=jac,method=method,bounds=bounds,x_scale='jac',
+                          max_nfev=max_nfev,verbose=int(visible))
+        if not res.success: warnings.warn('Fitting did not converge: '+res.message)
+
+        #covariance matrix from derivatives in found solution
+        try: cov=np.linalg.inv(np.dot(res.jac.T,res.jac))
+        except np.linalg.LinAlgError:
+            warnings.warn('Singular matrix! Covariance matrix is not reliable.')
+            cov=np.linalg.pinv(np.dot(res.jac.T,res.jac))
+        if not (self._set_err or self._calc_err):
+            #unknown errors of data -> scaling by reduced chi2
+            cov*=2*res.cost/max(len(self.t)-len(names),1)
+
+        self.params_err={} #remove errors of parameters
+        #remove some values calculated from old parameters
+        self.paramsMore={}
+        self.paramsMore_err={}
+
+        for i,p in enumerate(names):
+            #save values and errors of parameters
+            self.params[p]=res.x[i]
+            self.params_err[p]=np.sqrt(cov[i,i])
+            if method=='lm' and p in self.limits and not self.limits[p][0]<=res.x[i]<=self.limits[p][1]:
+                warnings.warn('Value of parameter "'+p+'" is outside of limits!')
+        self.cov=cov
+        self._fit='LM'
+
+        return self.params,self.params_err,cov
+
+    def FitMCMC(self,n_iter,burn=0,binn=1,walkers=0,visible=True,db=None,workers=1,vectorize=True,resume=False,
+                converge=False,max_time=None,seed=None,callback=None):
         '''fitting with Markov chain Monte Carlo using emcee
         n_iter - number of MC iteration - should be at least 1e5
         burn - number of removed steps before equilibrium - should be approx. 0.1-1% of n_iter
@@ -2171,12 +2988,24 @@ class OCFit(ComplexFit,Common):
         walkers - number of walkers - should be at least 2-times number of fitted parameters
         visible - display status of fitting
         db - name of database to save MCMC fitting details (could be analysed later using InfoMCMC function)
+        workers - number of processes for multiprocessing (pool is kept running for next fittings, see ClosePool)
+        vectorize - calculate all walkers at once (split between workers) or one by one (slower, model does not need to be vectorized)
+        resume - continue in interrupted fitting saved in db (chain is saved continuously during fitting)
+        converge - stop fitting when chain converged (n_iter is max. number of iterations); True or dict with settings
+            (see converge_mcmc - checked every "block" iterations)
+        max_time - max. time of fitting in seconds
+        info about fitting (reason of stopping, number of samples, acceptance fraction, autocorrelation times) is in "fitInfo"
+        seed - seed (or np.random.Generator) for reproducible fitting (default - from global numpy random state)
+        callback - function called with progress of fitting (dict); fitting is stopped if it returns True
         '''
 
-        #setting emcee priors for fitted parameters
-        priors={}
-        for p in self.fit_params:
-            priors[p]=_Prior("limuniform",lower=self.limits[p][0],upper=self.limits[p][1],name=p)
+        #setting emcee uniform priors for fitted parameters
+        lower=[self.limits[p][0] for p in self.fit_params]
+        upper=[self.limits[p][1] for p in self.fit_params]
+        lnpost=_LnPost(self._DataCopy(self.fit_params),self.fit_params,lower,upper,self._Spec())
+        if workers>1 and vectorize:
+            lnpost.pool=self._StartPool(workers,self.fit_params)
+            lnpost.workers=workers
 
         dims=len(self.fit_params)
         if walkers==0: walkers=dims*2
@@ -2184,31 +3013,10 @@ class OCFit(ComplexFit,Common):
             walkers=dims*2
             warnings.warn('Numbers of walkers is smaller than two times number of free parameters. Auto-set to '+str(int(walkers))+'.')
 
-
-        def likeli(names, vals):
-            '''likelihood function for emcee'''
-            pp={n:v for n,v in zip(names,vals)}
-
-            likeli=-0.5*self.Chi2(pp)
-            return likeli
-
-        def lnpostdf(values):
-            # Parameter-Value dictionary
-            ps = dict(zip(self.fit_params,values))
-            # Check prior information
-            prior_sum = 0
-            for name in self.fit_params: prior_sum += priors[name](ps, name)
-            # If log prior is negative infinity, parameters
-            # are out of range, so no need to evaluate the
-            # likelihood function at this step:
-            pdf = prior_sum
-            if pdf == -np.inf: return pdf
-            # Likelihood
-            pdf += likeli(self.fit_params, values)
-            return pdf
-
         # Generate the sampler
-        emceeSampler=emcee.EnsembleSampler(int(walkers),int(dims),lnpostdf)
+        emceeSampler,pool=_EmceeSampler(lnpost,walkers,dims,workers,vectorize)
+        rng=RandomGenerator(seed)
+        emceeSampler.random_state=np.random.RandomState(rng.integers(2**31)).get_state()
 
         # Generate starting values
         pos = []
@@ -2220,7 +3028,7 @@ class OCFit(ComplexFit,Common):
                 while True:
                     if tc == 100:
                         raise ValueError('Could not determine valid starting point for parameter: "'+n+'" due to its limits! Try to change the limits and/or step.')
-                    propval = np.random.normal(self.params[n],self.steps[n])
+                    propval = rng.normal(self.params[n],self.steps[n])
                     if propval < self.limits[n][0]:
                         tc += 1
                         continue
@@ -2230,35 +3038,23 @@ class OCFit(ComplexFit,Common):
                     break
                 pos[-1][i] = propval
 
-        # Default value for state
-        state = None
-
-        if burn>0:
-            # Run burn-in
-            pos,prob,state=emceeSampler.run_mcmc(pos,int(burn),progress=visible)
-            # Reset the chain to remove the burn-in samples.
-            emceeSampler.reset()
-
-        pos,prob,state=emceeSampler.run_mcmc(pos,int(n_iter),rstate0=state,thin=int(binn),progress=visible)
-
-        if not db is None:
-            sampleArgs={}
-            sampleArgs["burn"] = int(burn)
-            sampleArgs["binn"] = int(binn)
-            sampleArgs["iters"] = int(n_iter)
-            sampleArgs["nwalker"] = int(walkers)
-            np.savez_compressed(open(db,'wb'),chain=emceeSampler.chain,lnp=emceeSampler.lnprobability,                               pnames=list(self.fit_params),sampleArgs=sampleArgs)
+        chain,self.fitInfo=_RunEmcee(emceeSampler,pos,n_iter,burn,binn,visible,db,self.fit_params,resume,converge,max_time,callback)
+        if pool is not None:
+            pool.close()
+            pool.join()
+        flat=chain.reshape((-1,dims))
 
         self.params_err={} #remove errors of parameters
         #remove some values calculated from old parameters
         self.paramsMore={}
         self.paramsMore_err={}
 
-        for p in self.fit_params:
+        #mean, median, STD and confidence intervals of all parameters at once
+        self.statsMCMC=ChainSummary(flat,self.fit_params)
+        for i,p in enumerate(self.fit_params):
             #calculate values and errors of parameters and save them
-            i=self.fit_params.index(p)
-            self.params[p]=np.mean(emceeSampler.flatchain[:,i])
-            self.params_err[p]=np.std(emceeSampler.flatchain[:,i])
+            self.params[p]=self.statsMCMC['mean'][i]
+            self.params_err[p]=self.statsMCMC['std'][i]
         self._fit='MCMC'
 
         return self.params,self.params_err
@@ -2475,6 +3271,13 @@ class OCFit(ComplexFit,Common):
         if n-g-1>0: text.append('AICc = '+str(chi+2*g*n/(n-g-1)))
         else: text.append('AICc = NA')
         text.append('BIC = '+str(chi+g*np.log(n)))
+        if self._fit=='MCMC' and self.statsMCMC is not None:
+            #posterior distributions of fitted parameters
+            text.append('')
+            text.append('parameter'.ljust(15,' ')+'median'.ljust(30,' ')+'1sigma - 68%')
+            for row in self.statsMCMC:
+                text.append(str(row['param']).ljust(15,' ')+str(row['median']).ljust(30,' ')+
+                            str(row['1sigma_lo'])+' ... '+str(row['1sigma_hi']))
         if name is None:
             #output to screen
             print('------------------------------------')
@@ -2937,45 +3740,12 @@ class OCFit(ComplexFit,Common):
         ''''calculate model curve of O-C in given times based on given set of parameters'''
         if t is None: t=self.t
         if param is None: param=self.params
-        if self.model=='LiTE3':
-            model=self.LiTE3(t,param['a_sin_i3'],param['e3'],param['w3'],param['t03'],param['P3'])
-        elif self.model=='LiTE34':
-            model=self.LiTE34(t,param['a_sin_i3'],param['e3'],param['w3'],param['t03'],param['P3'],
-                              param['a_sin_i4'],param['e4'],param['w4'],param['t04'],param['P4'])
-        elif self.model=='LiTE3Quad':
-            model=self.LiTE3Quad(t,param['t0'],param['P'],param['Q'],param['a_sin_i3'],param['e3'],
-                                 param['w3'],param['t03'],param['P3'])
-        elif self.model=='LiTE34Quad':
-            model=self.LiTE34Quad(t,param['t0'],param['P'],param['Q'],
-                                  param['a_sin_i3'],param['e3'],param['w3'],param['t03'],param['P3'],
-                                  param['a_sin_i4'],param['e4'],param['w4'],param['t04'],param['P4'])
-        elif self.model=='AgolInPlanet':
-            model=self.AgolInPlanet(t,param['P'],param['a'],param['w'],param['e'],
-                                    param['mu3'],param['r3'],param['w3'],param['t03'],param['P3'])
-        elif self.model=='AgolInPlanetLin':
-            model=self.AgolInPlanetLin(t,param['t0'],param['P'],param['a'],param['w'],param['e'],
-                                       param['mu3'],param['r3'],param['w3'],param['t03'],param['P3'])
-        elif self.model=='AgolExPlanet':
-            model=self.AgolExPlanet(t,param['P'],param['mu3'],param['e3'],param['t03'],param['P3'])
-        elif self.model=='AgolExPlanetLin':
-            model=self.AgolExPlanetLin(t,param['t0'],param['P'],param['mu3'],param['e3'],param['t03'],param['P3'])
-        elif self.model=='Apsidal':
-            if min_type is None: min_type=self._min_type
-            model=self.Apsidal(t,param['t0'],param['P'],param['w0'],param['dw'],param['e'],min_type)
-        elif self.model=='ApsidalQuad':
-            if min_type is None: min_type=self._min_type
-            model=self.ApsidalQuad(t,param['t0'],param['P'],param['Q'],param['w0'],param['dw'],param['e'],min_type)
-        elif self.model=='LiTE3Apsidal':
+        spec=self._Spec()
+        values=[param[p] for p in spec.params]
+        if spec.apsidal:
             if min_type is None: min_type=self._min_type
-            model=self.LiTE3Apsidal(t,param['a_sin_i3'],param['e3'],param['w3'],param['t03'],param['P3'],
-                                    param['t0'],param['P'],param['w0'],param['dw'],param['e'],min_type)
-        elif self.model=='LiTE3ApsidalQuad':
-            if min_type is None: min_type=self._min_type
-            model=self.LiTE3ApsidalQuad(t,param['a_sin_i3'],param['e3'],param['w3'],param['t03'],param['P3'],
-                                        param['t0'],param['P'],param['Q'],param['w0'],param['dw'],param['e'],min_type)
-        else:
-            raise ValueError('The model "'+self.model+'" does not exist!')
-        return model
+            return spec.func(self,t,*values,min_type)
+        return spec.func(self,t,*values)
 
 
     def CalcErr(self):
@@ -3227,7 +3997,7 @@ class OCFit(ComplexFit,Common):
             color='r'
             lw=1
 
-        if 'Apsidal' in self.model:
+        if self._Spec().apsidal:
             #primary
             model_long=self.Model(t1,params,min_type=np.zeros(t1.shape))
             if epoch and not double_ax: ax1.plot(E,model_long*k,color,linewidth=lw,label=legend[1],zorder=2)
@@ -3495,7 +4265,7 @@ class OCFit(ComplexFit,Common):
         self.epoch=np.linspace(E_min,E_max,n)
         t=t0+P*self.epoch
 
-        if 'Apsidal' in self.model:
+        if self._Spec().apsidal:
             typeA=np.append(np.zeros(t.shape),np.ones(t.shape))
             t=np.append(t,t)
             self.epoch=np.append(self.epoch,self.epoch)
@@ -3545,7 +4315,7 @@ class OCFit(ComplexFit,Common):
         elif P is None: raise TypeError('P is not given!')
 
         old_epoch=self.epoch
-        if not len(self.epoch)==len(self.t): self.Epoch(self.t,t0,P)
+        if not len(self.epoch)==len(self.t): self.Epoch(t0,P)
 
         model=self.Model(self.t,params)
 
@@ -3573,11 +4343,34 @@ class OCFit(ComplexFit,Common):
 
 
 
+#built-in models
+RegisterModel('LiTE3',['a_sin_i3','e3','w3','t03','P3'],OCFit.LiTE3,OCFit.LiTE3Jac)
+RegisterModel('LiTE34',['a_sin_i3','e3','w3','t03','P3','a_sin_i4','e4','w4','t04','P4'],OCFit.LiTE34,OCFit.LiTE34Jac)
+RegisterModel('LiTE3Quad',['t0','P','Q','a_sin_i3','e3','w3','t03','P3'],OCFit.LiTE3Quad,OCFit.LiTE3QuadJac)
+RegisterModel('LiTE34Quad',['t0','P','Q','a_sin_i3','e3','w3','t03','P3','a_sin_i4','e4','w4','t04','P4'],
+              OCFit.LiTE34Quad,OCFit.LiTE34QuadJac)
+RegisterModel('AgolInPlanet',['P','a','w','e','mu3','r3','w3','t03','P3'],OCFit.AgolInPlanet,OCFit.AgolInPlanetJac)
+RegisterModel('AgolInPlanetLin',['t0','P','a','w','e','mu3','r3','w3','t03','P3'],OCFit.AgolInPlanetLin,
+              OCFit.AgolInPlanetLinJac)
+RegisterModel('AgolExPlanet',['P','mu3','e3','t03','P3'],OCFit.AgolExPlanet,OCFit.AgolExPlanetJac)
+RegisterModel('AgolExPlanetLin',['t0','P','mu3','e3','t03','P3'],OCFit.AgolExPlanetLin,OCFit.AgolExPlanetLinJac)
+RegisterModel('Apsidal',['t0','P','w0','dw','e'],OCFit.Apsidal,OCFit.ApsidalJac,apsidal=True)
+RegisterModel('ApsidalQuad',['t0','P','Q','w0','dw','e'],OCFit.ApsidalQuad,OCFit.ApsidalQuadJac,apsidal=True)
+RegisterModel('LiTE3Apsidal',['a_sin_i3','e3','w3','t03','P3','t0','P','w0','dw','e'],OCFit.LiTE3Apsidal,
+              OCFit.LiTE3ApsidalJac,apsidal=True)
+RegisterModel('LiTE3ApsidalQuad',['a_sin_i3','e3','w3','t03','P3','t0','P','Q','w0','dw','e'],
+              OCFit.LiTE3ApsidalQuad,OCFit.LiTE3ApsidalQuadJac,apsidal=True)
+for _m in kernels.models: models[_m].kernel=kernels.models[_m]   #compiled kernels of built-in models
+
+
+
 class OCFitLoad(OCFit):
     '''loading saved data, model... from OCFit class'''
-    def __init__(self,path):
-        '''loading data, model, parameters... from file'''
-        super().__init__([0],[0],[0])
+    def __init__(self,path,backend='numpy',mmap=False):
+        '''loading data, model, parameters... from file
+        mmap - data arrays from binary file (npz) are memory-mapped (not read to RAM)
+        '''
+        super().__init__([0],[0],[0],backend=backend)
 
-        self.Load(path)
+        self.Load(path,mmap)
 
@@ -3,6 +3,9 @@ from .OC_class import FitQuad
 from .OC_class import OCFit
 from .OC_class import OCFitLoad
 from .OC_class import DeltaEpoch,Epoch
+from .OC_class import LoadMinima,MethodValues
+from .models import RegisterModel
+from .batch import Batch
 
 __version__='0.2.2'
 
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+#batch fitting of many O-C diagrams (e.g. catalogs of eclipsing binaries)
+#version 0.2.2
+#update: 18.10.2026
+# (c) Pavol Gajdos, 2018-2026
+
+import os
+import sys
+import glob
+import json
+import multiprocessing
+import traceback
+from time import time,sleep
+
+import numpy as np
+
+from .OC_class import OCFit,OCFitLoad,_NumpyEncoder
+
+#default fitting procedure - list of [method, arguments of function OCFit.Fit<method>]
+plan_default=[['GA',{'generation':100,'size':100}],['LM',{}]]
+
+def _SaveJSON(data,path):
+    '''save data to JSON file atomically (old file is valid until new one is written)'''
+    with open(path+'.tmp','w') as f: json.dump(data,f,cls=_NumpyEncoder)
+    os.replace(path+'.tmp',path)
+
+def LoadJob(job,backend='numpy'):
+    '''create OCFit class for one job (star)
+    job - dict with name of saved OCFit class ("file") or with name of text file with data ("data" - columns t, oc, (err))
+        and linear ephemeris ("t0", "P"), "model", "fit_params", "limits", "steps" and values of parameters ("params")
+    '''
+    if 'file' in job: fit=OCFitLoad(job['file'],backend=backend)
+    else:
+        data=np.loadtxt(job['data'],ndmin=2)
+        if data.shape[1]>2: err=data[:,2]
+        else: err=None
+        fit=OCFit(data[:,0],data[:,1],err,dE=job.get('dE',0.5),backend=backend)
+        fit.Epoch(job['t0'],job['P'])
+    if 'model' in job: fit.model=job['model']
+    if 'fit_params' in job: fit.fit_params=list(job['fit_params'])
+    for x in ['limits','steps','params']:
+        if x in job: getattr(fit,x).update(job[x])
+    return fit
+
+def RunPlan(fit,plan,db=None,callback=None):
+    '''run fitting procedure (plan) on OCFit class "fit"
+    plan - list of [method, arguments of function OCFit.Fit<method>], e.g. [['GA',{'generation':100,'size':100}],['LM',{}]];
+        method "Weight" - scaling of errors according to current model (if errors were not given)
+    db - prefix of names of databases (argument "db" of step is added to it)
+    callback - function called with progress of fitting (dict) - see OCFit.FitGA; fitting is stopped if it returns True
+    output - list of [method, info about fitting]
+    '''
+    info=[]
+    for method,kwargs in plan:
+        if method=='Weight':
+            if not fit._set_err: fit.AddWeight(1./fit.err)
+            continue
+        kwargs=dict(kwargs)
+        kwargs.setdefault('visible',False)
+        if 'db' in kwargs and db is not None: kwargs['db']=db+kwargs['db']
+        if callback is not None and not method=='LM': kwargs['callback']=callback
+        fit.fitInfo={}
+        getattr(fit,'Fit'+method)(**kwargs)
+        info.append([method,dict(fit.fitInfo)])
+        if fit.fitInfo.get('stop')=='callback': break
+    return info
+
+def RunJob(job,plan,output,backend='numpy'):
+    '''fit one job (star) according to plan - fitted class and result are saved to folder "output"
+    plan - list of [method, arguments], e.g. [['GA',{'generation':100,'size':100}],['MCMC',{'n_iter':1e4}]]
+    '''
+    tic=time()
+    name=job['name']
+    result={'name':name,'status':'running','start':tic}
+    try:
+        fit=LoadJob(job,backend)
+        info=RunPlan(fit,plan,os.path.join(output,name+'-'))
+        fit.Save(os.path.join(output,name+'.json'))
+        result.update({'status':'done','model':fit.model,'fit':fit._fit,'chi2':fit.Chi2(fit.params),'n':len(fit.t),
+                       'params':fit.params,'params_err':fit.params_err,'fitInfo':info})
+    except Exception as e:
+        result.update({'status':'failed','error':repr(e),'traceback':traceback.format_exc()})
+    result['time']=time()-tic
+    _SaveJSON(result,os.path.join(output,name+'.result.json'))
+    return result
+
+def _RunJobProcess(job,plan,output,backend):
+    '''run job in separate process (without output to screen)'''
+    f=open(os.devnull,'w')
+    sys.stdout=f
+    RunJob(job,plan,output,backend)
+    f.close()
+
+class Batch():
+    '''batch fitting of many O-C diagrams (stars) in parallel processes
+    result of each star is saved as soon as its fitting finishes (checkpoint) -> fitting could be restarted
+    after crash (or interruption) without repeating of finished stars
+    '''
+    def __init__(self,jobs,output,plan=None,workers=1,timeout=None,backend='numpy'):
+        '''jobs - folder with saved OCFit classes (*.json, *.pkl, *.npz), manifest (JSON file with list of jobs) or list of jobs
+            (see LoadJob; name of star is given by "name" or name of file; job could have own "plan")
+        output - folder for results (fitted classes, results of stars, table of results)
+        plan - fitting procedure - list of [method, arguments of function OCFit.Fit<method>] (default plan_default)
+        workers - number of stars fitted at once (in separate processes)
+        timeout - max. time of fitting of one star in seconds (fitting is terminated after it)
+        backend - backend used for calculation of chi2 ("numpy" or "numba")
+        '''
+        if isinstance(jobs,str):
+            if os.path.isdir(jobs):
+                files=sorted(glob.glob(os.path.join(jobs,'*.json'))+glob.glob(os.path.join(jobs,'*.pkl'))+glob.glob(os.path.join(jobs,'*.npz')))
+                jobs=[{'file':f} for f in files]
+            else:
+                with open(jobs,'r') as f: jobs=json.load(f)
+        self.jobs=[]
+        for job in jobs:
+            job=dict(job)
+            if not 'name' in job:
+                if 'file' in job: job['name']=os.path.splitext(os.path.basename(job['file']))[0]
+                else: job['name']=os.path.splitext(os.path.basename(job['data']))[0]
+            self.jobs.append(job)
+        names=[job['name'] for job in self.jobs]
+        if len(set(names))<len(names): raise ValueError('Names of jobs (stars) have to be unique!')
+
+        self.output=output
+        if not os.path.isdir(output): os.makedirs(output)
+        if plan is None: plan=plan_default
+        self.plan=plan
+        self.workers=int(workers)
+        self.timeout=timeout
+        self.backend=backend
+
+    def _ResultPath(self,name):
+        '''name of file with result of star'''
+        return os.path.join(self.output,name+'.result.json')
+
+    def Result(self,name):
+        '''result of fitting of star (dict) or None if star was not fitted yet'''
+        path=self._ResultPath(name)
+        if not os.path.isfile(path): return None
+        with open(path,'r') as f: return json.load(f)
+
+    def Results(self):
+        '''results of all fitted stars'''
+        res=[self.Result(job['name']) for job in self.jobs]
+        return [r for r in res if r is not None]
+
+    def Pending(self,retry=False):
+        '''jobs which have to be fitted (not finished; retry - also failed or terminated jobs)'''
+        pending=[]
+        for job in self.jobs:
+            res=self.Result(job['name'])
+            if res is None or (retry and not res['status']=='done'): pending.append(job)
+        return pending
+
+    def Run(self,retry=False,visible=True):
+        '''fit all pending stars (already finished stars are skipped)
+        retry - fit again also stars with failed fitting or terminated after timeout
+        visible - display status of fitting
+        '''
+        pending=self.Pending(retry)
+        n=len(pending)
+        running=[]
+        done=0
+        tic=time()
+        while len(pending)>0 or len(running)>0:
+            #start new processes
+            while len(pending)>0 and len(running)<self.workers:
+                job=pending.pop(0)
+                if os.path.isfile(self._ResultPath(job['name'])): os.remove(self._ResultPath(job['name']))   #old result (retry)
+                proc=multiprocessing.Process(target=_RunJobProcess,args=(job,job.get('plan',self.plan),self.output,self.backend))
+                proc.start()
+                running.append([proc,job['name'],time()])
+
+            sleep(0.05)
+            for run in list(running):
+                proc,name,start=run
+                if proc.is_alive():
+                    if self.timeout is None or time()-start<self.timeout: continue
+                    #fitting of star is too long
+                    proc.terminate()
+                    proc.join()
+                    _SaveJSON({'name':name,'status':'timeout','time':time()-start},self._ResultPath(name))
+                else:
+                    proc.join()
+                    res=self.Result(name)
+                    if res is None or res['status']=='running':
+                        _SaveJSON({'name':name,'status':'failed','error':'Process crashed with exit code '+str(proc.exitcode),
+                                   'time':time()-start},self._ResultPath(name))
+                running.remove(run)
+                done+=1
+                self.SaveTable()
+                if visible:
+                    sys.stdout.write('Batch fitting: '+str(done)+' / '+str(n)+' stars ('+name+': '+
+                                     self.Result(name)['status']+') in '+str(np.round(time()-tic,1))+' sec\n')
+                    sys.stdout.flush()
+        self.SaveTable()
+        return self.Results()
+
+    def SaveTable(self,path=None):
+        '''save table with results of all fitted stars (values and errors of all parameters)'''
+        if path is None: path=os.path.join(self.output,'results.tbl')
+        res=self.Results()
+        params=sorted(set(p for r in res for p in r.get('params',{})))
+        head=['name','status','model','fit','n','chi2','time']
+        for p in params: head+=[p,p+'_err']
+        lines=['\t'.join(head)]
+        for r in res:
+            line=[str(r.get(x,'')) for x in head[:7]]
+            for p in params:
+                line.append(str(r.get('params',{}).get(p,'')))
+                line.append(str(r.get('params_err',{}).get(p,'')))
+            lines.append('\t'.join(line))
+        with open(path+'.tmp','w') as f: f.write('\n'.join(lines)+'\n')
+        os.replace(path+'.tmp',path)
+
+
+if __name__=='__main__':
+    #run from command line: python3 -m OCFit.batch jobs output [workers] [timeout]
+    if len(sys.argv)<3:
+        print('Usage: python3 -m OCFit.batch jobs output [workers] [timeout]')
+        sys.exit(1)
+    workers=1
+    timeout=None
+    if len(sys.argv)>3: workers=int(sys.argv[3])
+    if len(sys.argv)>4: timeout=float(sys.argv[4])
+    Batch(sys.argv[1],sys.argv[2],workers=workers,timeout=timeout).Run()
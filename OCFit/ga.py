@@ -1,36 +1,46 @@
 #class for Genetic Algorithms
-#version 0.1.1
-#update: 12.3.2017
+#version 0.2.0
+#update: 18.10.2026
 # (c) Pavol Gajdos, 2018
 
 import numpy as np
-import random
+
+def RandomGenerator(seed=None):
+    '''random generator from seed (int, SeedSequence or Generator)
+    without seed - generator is seeded from global numpy random state (reproducible using np.random.seed)'''
+    if isinstance(seed,np.random.Generator): return seed
+    if seed is None: seed=np.random.randint(2**31)
+    return np.random.default_rng(seed)
+
+def SpawnGenerators(seed,n):
+    '''"n" independent random generators (e.g. for parallel workers) spawned from one seed by SeedSequence'''
+    if isinstance(seed,np.random.SeedSequence): ss=seed
+    elif seed is None or isinstance(seed,np.random.Generator): ss=np.random.SeedSequence(int(RandomGenerator(seed).integers(2**63)))
+    else: ss=np.random.SeedSequence(seed)
+    return [np.random.default_rng(x) for x in ss.spawn(n)]
 
 class TPopul:
     '''class for Genetic Algorithms'''
-    def __init__(self,size,params,mut,steps,limits,SP):
+    def __init__(self,size,params,mut,steps,limits,SP,elite=0,rng=None):
+        self.rng=RandomGenerator(rng)   #random generator (or seed) - all random numbers are taken from it
         self.size=size  #size of population
+        self.elite=min(int(elite),size)   #count of best individuals copied to next generation
         self.n=len(params)    #count of free parameters
         self.params=params   #free parameters
         self.n_mut=int(round(mut*size))   #count of mutations
-        self.steps=steps    #variation of Gauss distribution for changing of params
-        self.limits=limits   #limits of parameters
+        self.steps=np.array([steps[p] for p in params],dtype=float)    #variation of Gauss distribution for changing of params
+        self.lower=np.array([limits[p][0] for p in params],dtype=float)   #limits of parameters
+        self.upper=np.array([limits[p][1] for p in params],dtype=float)
         self.edge=[]        #edges for roulette wheel
 
-        #creating of population
-        self.p=[]
-        self.o=[]
-        for i in range(size):
-            temp={}
-            for p in params:
-                temp[p]=(limits[p][1]-limits[p][0])*np.random.rand()+limits[p][0]
-            self.p.append(temp)
-            self.o.append(dict(temp))
+        #creating of population - one row = one individual, columns in order given by "params"
+        self.p=(self.upper-self.lower)*self.rng.random((size,self.n))+self.lower
+        self.o=np.array(self.p)
 
         #create sectors for roulette wheel (selective pressure) for crossing generations
         #given by Razali, N. M., Geraghty, J., 2011, Lect. Notes in Eng. Comp. Sci., 2191, 1134
-        self.sectors=[]
-        for i in range(self.size,0,-1): self.sectors.append(2-SP+2*(SP-1)*(i-1)/float(size-1))
+        i=np.arange(self.size,0,-1)
+        self.sectors=2-SP+2*(SP-1)*(i-1)/float(size-1)
 
 
     def Roulette(self,objfun):
@@ -38,57 +48,60 @@ class TPopul:
         rank=np.argsort(objfun)
         self.edge=np.zeros(self.size)
         self.edge[rank]=self.sectors
-        for i in range(1,self.size): self.edge[i]+=self.edge[i-1]
-        self.edge=np.array(self.edge)/self.edge[-1]
+        self.edge=np.cumsum(self.edge)
+        self.edge/=self.edge[-1]
 
-    def Rand(self):
-        '''select individual from population according to slot in roulette wheel'''
-        temp=np.random.rand()
-        i=np.where(temp<self.edge)[0][0]
-        return i
+    def Rand(self,k=None):
+        '''select individual (or "k" individuals at once) from population according to slot in roulette wheel'''
+        if k is None: return int(np.searchsorted(self.edge,self.rng.random(),side='right'))
+        return np.searchsorted(self.edge,self.rng.random(k),side='right')
 
     def Cross(self,p1,p2):
-        '''crossing of generations'''
-        cxb=random.sample(self.params,random.randint(1,self.n))
-
-        #copy p->o
-        o1=dict(p1)
-        o2=dict(p2)
-
-        if random.randint(0,2)==2:
-            return [p1,p2]
-
-        #crossing
-        for p in cxb:
-            o1[p]=p2[p]
-            o2[p]=p1[p]
+        '''crossing of generations - p1, p2 are matrices of pairs of parents (one row = one individual)'''
+        m=len(p1)
+        #random subset of params (with random size) for each pair
+        k=self.rng.integers(1,self.n+1,m)
+        rank=np.argsort(np.argsort(self.rng.random((m,self.n)),axis=1),axis=1)
+        cxb=rank<k[:,np.newaxis]
+        #without crossing with probability 1/3
+        cxb[self.rng.integers(0,3,m)==2]=False
+
+        o1=np.where(cxb,p2,p1)
+        o2=np.where(cxb,p1,p2)
         return [o1,o2]
 
 
     def Mutation(self,i):
-        '''mutations'''
-        for p in self.params:
-            #change from Gauss normal distribution
-            dx=np.random.normal(scale=self.steps[p])
-            self.p[i][p]+=dx
-            #if new value is outside searching interval
-            if (self.p[i][p]>self.limits[p][1]) or (self.p[i][p]<self.limits[p][0]):
-                self.p[i][p]=self.o[i][p]
+        '''mutations of individuals with indices "i" (could be repeated)'''
+        #change from Gauss normal distribution
+        dx=self.rng.normal(size=(len(i),self.n))*self.steps
+        np.add.at(self.p,i,dx)
+        #if new value is outside searching interval -> reflection from limits
+        width=self.upper-self.lower
+        x=np.mod(self.p[i]-self.lower,2*width,out=np.zeros((len(i),self.n)),where=width>0)
+        x=np.where(x>width,2*width-x,x)
+        self.p[i]=self.lower+x
 
     def Next(self,objfun):
         '''creating new generation'''
+        #best individuals of current generation
+        if self.elite>0: best=self.p[np.argsort(objfun)[:self.elite]]
         #create roulette
         self.Roulette(objfun)
         #new population
-        i=0
-        while i<self.size-1:
-            o=self.Cross(self.p[self.Rand()],self.p[self.Rand()])
-            self.o[i]=dict(o[0])
-            self.o[i+1]=dict(o[1])
-            i+=2
+        m=self.size//2
+        sel=self.Rand(2*m)
+        o=self.Cross(self.p[sel[:m]],self.p[sel[m:]])
+        self.o=np.empty((self.size,self.n))
+        self.o[0:2*m:2]=o[0]
+        self.o[1:2*m:2]=o[1]
+        if self.size%2: self.o[-1]=self.p[self.Rand()]
 
         #reversing population
-        for i in range(self.size): self.p[i]=dict(self.o[i])
+        self.p=np.array(self.o)
 
         #applying mutation
-        for mut in range(self.n_mut): self.Mutation(random.randint(0,self.size-1))
+        if self.n_mut>0: self.Mutation(self.rng.integers(0,self.size,self.n_mut))
+
+        #elitism - best individuals are copied without change
+        if self.elite>0: self.p[:self.elite]=self.o[:self.elite]=best
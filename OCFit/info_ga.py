@@ -9,6 +9,8 @@ from pickle import load
 
 import numpy as np
 
+from .storage import TraceDB,IsDB,chunk_size
+
 try: import matplotlib.pyplot as mpl
 except:
     #import on server without graphic output
@@ -30,9 +32,16 @@ class InfoGA():
     '''statistics about GA or DE fitting from db file'''
     def __init__(self,dbfile):
         '''load db file from GA or DE'''
-        f=open(dbfile,'rb')
-        self.trace=load(f)
-        f.close()
+        if IsDB(dbfile,TraceDB.kind):
+            #trace saved continuously during fitting - memory-mapped (not loaded to RAM)
+            self.ta=TraceDB(dbfile)
+            self.trace={'chi2':self.ta.chi2}
+            for p in self.ta.pnames: self.trace[p]=self.ta.Param(p)
+        else:
+            #old format - pickled dict
+            f=open(dbfile,'rb')
+            self.trace=load(f)
+            f.close()
 
         path=dbfile.replace('\\','/')
         if path.rfind('/')>0: self.path=path[:path.rfind('/')+1]
@@ -46,14 +55,66 @@ class InfoGA():
         size=self.chi2.shape[1]
         self.info={'gen':gen,'size':size}
 
+        #statistics of generations (calculated only once)
+        self._stats=None
+        self._pstats={}
+
+    def _Blocks(self):
+        '''slices of generations - only one block of generations is loaded to RAM at once'''
+        n=max(1,chunk_size//max(self.info['size'],1))
+        for i in range(0,self.info['gen'],n): yield slice(i,i+n)
+
+    def GenStats(self):
+        '''statistics of chi2 in each generation calculated in one pass (vectorized) - cached
+        output - dict with arrays: "best" (global best solution), "min", "max", "mean", "median",
+        "q25", "q75" (quartiles), "argmin" (index of best individual), "best_gen" (generation of global best solution)
+        '''
+        if self._stats is None:
+            gen=self.info['gen']
+            stats={x:np.zeros(gen) for x in ['min','max','mean','median','q25','q75']}
+            stats['argmin']=np.zeros(gen,dtype=int)
+            for b in self._Blocks():
+                x=np.asarray(self.chi2[b],dtype=float)
+                stats['argmin'][b]=np.argmin(x,axis=1)
+                stats['min'][b]=np.take_along_axis(x,stats['argmin'][b][:,np.newaxis],axis=1)[:,0]
+                stats['max'][b]=np.max(x,axis=1)
+                stats['mean'][b]=np.mean(x,axis=1)
+                stats['q25'][b],stats['median'][b],stats['q75'][b]=np.percentile(x,[25,50,75],axis=1)
+            stats['best']=np.minimum.accumulate(stats['min'])
+            #generation in which global best solution (up to given generation) was found
+            improve=stats['min']<np.append(np.inf,stats['best'][:-1])
+            stats['best_gen']=np.maximum.accumulate(np.where(improve,np.arange(gen),0))
+            self._stats=stats
+        return self._stats
+
+    def ParamStats(self,par):
+        '''statistics of parameter in each generation calculated in one pass (vectorized) - cached
+        output - dict with arrays: "best" (value of global best solution), "min", "max", "mean"
+        '''
+        if not par in self.availableTrace:
+            raise KeyError('Parameter "'+par+'" is not available!')
+        if not par in self._pstats:
+            gen=self.info['gen']
+            stats={x:np.zeros(gen) for x in ['min','max','mean']}
+            for b in self._Blocks():
+                x=np.asarray(self.trace[par][b],dtype=float)
+                stats['min'][b]=np.min(x,axis=1)
+                stats['max'][b]=np.max(x,axis=1)
+                stats['mean'][b]=np.mean(x,axis=1)
+            g=self.GenStats()
+            stats['best']=np.asarray(self.trace[par][g['best_gen'],g['argmin'][g['best_gen']]],dtype=float)
+            self._pstats[par]=stats
+        return self._pstats[par]
+
     def Stats(self,path=None):
         '''print basic info about GA or DE'''
         text=['Number of generations: '+str(self.info['gen']),
               'Size of generation: '+str(self.info['size']),
               'Number of fitted parameters: '+str(len(self.availableTrace)),
               'Fitted parameters: '+', '.join(sorted(self.availableTrace)),
-              'Minimal chi2 error: '+str(np.min(self.chi2))]
-        i=np.unravel_index(np.argmin(self.chi2),self.chi2.shape)
+              'Minimal chi2 error: '+str(self.GenStats()['best'][-1])]
+        g=self.GenStats()['best_gen'][-1]
+        i=(g,self.GenStats()['argmin'][g])
         text.append('-------------------\nBest values of parameters:')
         for p in self.availableTrace:
             text.append(p+': '+str(self.trace[p][i]))
@@ -64,45 +125,17 @@ class InfoGA():
         f.close()
 
 
-    def PlotChi2(self,best=True,mean=True,besti=False,mini=False,maxi=False,i=None,full=False,log=True):
-        '''plot chi2 error for best (Global), mean, best, minimal or maximal value in each generation or for selected individual or for all individuals'''
+    def PlotChi2(self,best=True,mean=True,besti=False,mini=False,maxi=False,i=None,full=False,log=True,median=False):
+        '''plot chi2 error for best (Global), mean, best, minimal, maximal or median value in each generation or for selected individual or for all individuals'''
         plot=[]
+        stats=self.GenStats()
 
-        if best:
-            chi_min=1e20
-            temp=[]
-            for gen in range(self.info['gen']):
-                gen_min=np.min(self.chi2[gen,:])
-                if gen_min<chi_min: chi_min=gen_min
-                temp.append(chi_min)
-            plot.append(['Global best solution',temp])
-
-        if mean:
-            temp=[]
-            for gen in range(self.info['gen']):
-                mean=np.mean(self.chi2[gen,:])
-                temp.append(mean)
-            plot.append(['Mean value',temp])
-
-        if besti:
-            temp=[]
-            for gen in range(self.info['gen']):
-                temp.append(np.min(self.chi2[gen,:]))
-            plot.append(['Best solution',temp])
-
-        if mini:
-            temp=[]
-            for gen in range(self.info['gen']):
-                x=np.min(self.chi2[gen,:])
-                temp.append(x)
-            plot.append(['Minimal value',temp])
-
-        if maxi:
-            temp=[]
-            for gen in range(self.info['gen']):
-                x=np.max(self.chi2[gen,:])
-                temp.append(x)
-            plot.append(['Maximal value',temp])
+        if best: plot.append(['Global best solution',stats['best']])
+        if mean: plot.append(['Mean value',stats['mean']])
+        if besti: plot.append(['Best solution',stats['min']])
+        if mini: plot.append(['Minimal value',stats['min']])
+        if maxi: plot.append(['Maximal value',stats['max']])
+        if median: plot.append(['Median value',stats['median']])
 
         if i is not None:
             plot.append(['Individual '+str(i),self.chi2[:,i]])
@@ -128,15 +161,12 @@ class InfoGA():
 
     def Dev(self,param,new_fig=True,i_gen=None,log=True):
         '''plot deviance for given generation or for all, for given parameter'''
-        val=[]
-        dev=[]
         if i_gen is None:
-            for gen in range(self.info['gen']):
-                dev+=list(self.chi2[gen,:])
-                val+=list(self.trace[param][gen,:])
+            dev=self.chi2.reshape(-1)
+            val=self.trace[param].reshape(-1)
         else:
-            dev+=list(self.chi2[i_gen,:])
-            val+=list(self.trace[param][i_gen,:])
+            dev=self.chi2[i_gen,:]
+            val=self.trace[param][i_gen,:]
 
         if new_fig: fig=mpl.figure()
         if log: mpl.semilogy(val,dev,'k.',alpha=0.2)
@@ -180,10 +210,8 @@ class InfoGA():
 
     def Hist(self,param,new_fig=True,i_gen=-1):
         '''plot histogram for given generation for given parameters'''
-        val=[]
-        if i_gen is None:
-            for gen in range(self.info['gen']): val+=list(self.trace[param][gen,:])
-        else: val+=list(self.trace[param][i_gen,:])
+        if i_gen is None: val=self.trace[param].reshape(-1)
+        else: val=self.trace[param][i_gen,:]
 
         if new_fig: fig=mpl.figure()
         mpl.hist(val,bins=20,color='k')
@@ -194,45 +222,16 @@ class InfoGA():
 
     def Trace(self,par,best=True,mean=True,mini=False,maxi=False,i=None,full=False):
         '''plot parameter trace for best, mean, minimal or maximal value in each generation or for selected individual or for all individuals'''
-        if not par in self.availableTrace:
-            raise KeyError('Parameter "'+par+'" is not available!')
+        stats=self.ParamStats(par)
         plot=[]
 
-        if best:
-            chi_min=1e20
-            par_min=1e20
-            temp=[]
-            for gen in range(self.info['gen']):
-                gen_min=np.argmin(self.chi2[gen,:])
-                if self.chi2[gen,gen_min]<chi_min:
-                    chi_min=self.chi2[gen,gen_min]
-                    par_min=self.trace[par][gen,gen_min]
-                temp.append(par_min)
-            plot.append(['Best solution',temp])
-
-        if mean:
-            temp=[]
-            for gen in range(self.info['gen']):
-                mean=np.mean(self.trace[par][gen,:])
-                temp.append(mean)
-            plot.append(['Mean value',temp])
-
-        if mini:
-            temp=[]
-            for gen in range(self.info['gen']):
-                x=np.min(self.trace[par][gen,:])
-                temp.append(x)
-            plot.append(['Minimal value',temp])
-
-        if maxi:
-            temp=[]
-            for gen in range(self.info['gen']):
-                x=np.max(self.trace[par][gen,:])
-                temp.append(x)
-            plot.append(['Maximal value',temp])
+        if best: plot.append(['Best solution',stats['best']])
+        if mean: plot.append(['Mean value',stats['mean']])
+        if mini: plot.append(['Minimal value',stats['min']])
+        if maxi: plot.append(['Maximal value',stats['max']])
 
         if i is not None:
-            plot.append(['Individual '+str(i),self.chi2[:,i]])
+            plot.append(['Individual '+str(i),self.trace[par][:,i]])
 
         if full:
             plot=[]
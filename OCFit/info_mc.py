@@ -13,7 +13,8 @@ try: import emcee
 except ModuleNotFoundError: warnings.warn('Module emcee not found! Using FitMC will not be possible!')
 
 import numpy as np
-from scipy.stats import pearsonr
+
+from .storage import ChainDB,IsDB,chunk_size
 
 try: import corner
 except ModuleNotFoundError: warnings.warn('Module corner not found! Ploting corner plot will not be possible!')
@@ -30,6 +31,71 @@ except:
         matplotlib.use('Agg',force=True)
         import matplotlib.pyplot as mpl
 
+#levels of confidence intervals in summary of params (1, 2 and 3 sigma)
+levels={'1sigma':0.6827,'2sigma':0.9545,'3sigma':0.9973}
+
+def ChainSummary(flat,pnames):
+    '''summary statistics of all params from flat chain (could be memmap) - mean, median, STD and confidence intervals
+    all quantiles are calculated in one partition-based pass (without sorting) through block of columns
+    output - table (numpy structured array) with one row for each parameter
+    '''
+    n,d=flat.shape
+    q=[0.5]
+    for l in levels.values(): q+=[1-l,l]
+    #positions of quantiles for linear interpolation (the same as np.quantile)
+    pos=np.array(q)*(n-1)
+    lo=np.floor(pos).astype(int)
+    hi=np.minimum(lo+1,n-1)
+    kth=np.unique(np.append(lo,hi))
+
+    dtype=[('param','U32'),('mean',float),('median',float),('std',float)]
+    for l in levels: dtype+=[(l+'_lo',float),(l+'_hi',float)]
+    table=np.zeros(d,dtype=dtype)
+    table['param']=pnames
+
+    cols=max(1,16*chunk_size//max(n,1))   #number of columns loaded to RAM at once
+    for j in range(0,d,cols):
+        x=np.array(flat[:,j:j+cols],dtype=float)
+        table['mean'][j:j+cols]=np.mean(x,axis=0)
+        table['std'][j:j+cols]=np.std(x,axis=0)
+        x.partition(kth,axis=0)
+        val=x[lo]+(pos-lo)[:,np.newaxis]*(x[hi]-x[lo])
+        table['median'][j:j+cols]=val[0]
+        for i,l in enumerate(levels):
+            table[l+'_lo'][j:j+cols]=val[2*i+1]
+            table[l+'_hi'][j:j+cols]=val[2*i+2]
+    return table
+
+def AutocorrTime(x,c=5):
+    '''integrated autocorrelation time from chain of one parameter with shape (samples, walkers)
+    autocorrelation function is calculated by FFT for each walker and averaged over walkers,
+    window is selected automatically (Sokal, 1997) - "c" - size of window in units of autocorrelation time
+    '''
+    n=x.shape[0]
+    m=2**int(np.ceil(np.log2(2*n)))   #zero padding - without circular correlation
+    dx=x-np.mean(x,axis=0)
+    f=np.fft.rfft(dx,n=m,axis=0)
+    acf=np.fft.irfft(f*np.conjugate(f),n=m,axis=0)[:n]
+    var=acf[0]
+    acf=acf[:,var>0]/var[var>0]
+    if acf.shape[1]==0: return np.nan   #constant chain
+    acf=np.mean(acf,axis=1)
+    taus=2*np.cumsum(acf)-1
+    window=np.arange(len(taus))<c*taus
+    if np.any(~window): return taus[np.argmin(window)]
+    return taus[-1]
+
+def GelmanRubin(x):
+    '''Gelman-Rubin convergence statistic R-hat (walkers are used as independent chains)
+    x - chain of one parameter with shape (samples, walkers)
+    '''
+    n=x.shape[0]
+    if n<2 or x.shape[1]<2: return np.nan
+    B=n*np.var(np.mean(x,axis=0),ddof=1)   #between-walker variance
+    W=np.mean(np.var(x,axis=0,ddof=1))     #within-walker variance
+    if W==0: return np.nan
+    return np.sqrt(((n-1.)/n*W+B/n)/W)
+
 def _plotsizeHelper(size):
     '''Helps to define the optimum plot size for large big-picture plots.'''
     c = 1
@@ -44,14 +110,161 @@ class InfoMC():
     '''statistics about MC fitting from db file'''
     def __init__(self,dbfile):
         '''load db file'''
-        self.ta=np.load(dbfile,allow_pickle=True)
         path=dbfile.replace('\\','/')
         if path.rfind('/')>0: self.path=path[:path.rfind('/')+1]
         else: self.path=''
-        self.pars=list(self.ta['pnames'])
 
-        self.flat=self.ta['chain'].reshape((self.ta['chain'].shape[0]*self.ta['chain'].shape[1],self.ta['chain'].shape[2]),order='F')
-        self.flatprob=self.ta['lnp'].reshape((self.ta['lnp'].shape[0]*self.ta['lnp'].shape[1]),order='F')
+        #chain is loaded only on demand
+        self._chain=None
+        self._lnp=None
+        #statistics calculated in one pass through chain (cached)
+        self._moments=None
+        self._hist2d={}
+        self._summary=None
+        self._diag=None
+        if IsDB(dbfile,ChainDB.kind):
+            #chain saved continuously during fitting - memory-mapped (not loaded to RAM)
+            self.ta=ChainDB(dbfile)
+            self.pars=list(self.ta.pnames)
+            self.sampleArgs=self.ta.sampleArgs
+        else:
+            #old format - npz file
+            self.ta=np.load(dbfile,allow_pickle=True)
+            self.pars=list(self.ta['pnames'])
+            self.sampleArgs=self.ta['sampleArgs'].item()
+
+    @property
+    def chain(self):
+        '''chain with shape (samples, walkers, params) - memory-mapped or loaded from npz file only once'''
+        if self._chain is None:
+            if isinstance(self.ta,ChainDB): self._chain=self.ta.chain
+            #npz: saved with shape (walkers, samples, params) -> only one copy in (samples, walkers, params)
+            else: self._chain=np.ascontiguousarray(np.swapaxes(self.ta['chain'],0,1))
+        return self._chain
+
+    @property
+    def lnp(self):
+        '''log probability with shape (samples, walkers)'''
+        if self._lnp is None:
+            if isinstance(self.ta,ChainDB): self._lnp=self.ta.lnp
+            else: self._lnp=np.ascontiguousarray(self.ta['lnp'].T)
+        return self._lnp
+
+    @property
+    def flat(self):
+        '''flat chain with shape (samples*walkers, params) - view of chain (no copy)'''
+        return self.chain.reshape((-1,len(self.pars)))
+
+    @property
+    def flatprob(self):
+        '''flat log probability - view (no copy)'''
+        return self.lnp.reshape(-1)
+
+    def Flat(self,thin=1):
+        '''flat chain using only every "thin"-th sample (only thinned values are copied)'''
+        if thin==1: return self.flat
+        return self.chain[::thin].reshape((-1,len(self.pars)))
+
+    def Column(self,param,thin=1):
+        '''values of one parameter - only this column is loaded from chain ("thin" - use only every "thin"-th sample)'''
+        return self.chain[::thin,:,self.pars.index(param)].reshape(-1)
+
+    def FlatProb(self,thin=1):
+        '''flat log probability using only every "thin"-th sample'''
+        return self.lnp[::thin].reshape(-1)
+
+    def _Chunks(self):
+        '''flat chain divided to chunks (only one chunk is loaded to RAM at once)'''
+        flat=self.flat
+        n=max(1,chunk_size//len(self.pars))
+        for i in range(0,flat.shape[0],n):
+            yield np.asarray(flat[i:i+n],dtype=float)
+
+    def Moments(self):
+        '''mean, STD, min, max, covariance and correlation matrix of all params
+        calculated in one pass through chain (chunks are merged by Chan's formula) and cached'''
+        if self._moments is None:
+            d=len(self.pars)
+            n=0
+            mean=np.zeros(d)
+            m2=np.zeros((d,d))
+            xmin=np.full(d,np.inf)
+            xmax=np.full(d,-np.inf)
+            for x in self._Chunks():
+                k=x.shape[0]
+                xm=x.mean(axis=0)
+                dx=x-xm
+                delta=xm-mean
+                m2+=np.dot(dx.T,dx)+np.outer(delta,delta)*n*k/float(n+k)
+                mean+=delta*k/float(n+k)
+                n+=k
+                xmin=np.minimum(xmin,x.min(axis=0))
+                xmax=np.maximum(xmax,x.max(axis=0))
+            cov=m2/n
+            std=np.sqrt(np.diag(cov))
+            with np.errstate(divide='ignore',invalid='ignore'):
+                corr=cov/np.outer(std,std)
+            self._moments={'n':n,'mean':mean,'std':std,'min':xmin,'max':xmax,'cov':cov,'corr':corr}
+        return self._moments
+
+    def Summary(self):
+        '''summary statistics of all params (see ChainSummary) - cached'''
+        if self._summary is None: self._summary=ChainSummary(self.flat,self.pars)
+        return self._summary
+
+    def Diagnostics(self):
+        '''diagnostics of chain for all params - integrated autocorrelation time (in saved samples),
+        effective sample size and Gelman-Rubin R-hat - cached
+        output - table (numpy structured array) with one row for each parameter
+        '''
+        if self._diag is None:
+            table=np.zeros(len(self.pars),dtype=[('param','U32'),('tau',float),('ess',float),('rhat',float)])
+            table['param']=self.pars
+            for i in range(len(self.pars)):
+                x=np.array(self.chain[:,:,i],dtype=float)   #only one param is loaded to RAM
+                table['tau'][i]=AutocorrTime(x)
+                table['ess'][i]=x.size/table['tau'][i]
+                table['rhat'][i]=GelmanRubin(x)
+            self._diag=table
+        return self._diag
+
+    def DiagTab(self,path=None):
+        '''save table with diagnostics of chain'''
+        if path is None: path=self.path
+        n=self.chain.shape[0]
+        f=open(path+'diag.tbl','w')
+        f.write('samples: '+str(n)+' (thin: '+str(self.sampleArgs['binn'])+')\n')
+        f.write('walkers: '+str(self.chain.shape[1])+'\n\n')
+        width=max([len(p) for p in self.pars]+[9])
+        head=('%'+str(width)+'s |')%'param'+' %12s | %12s | %8s | %s'%('tau','ESS','R-hat','N/tau')
+        f.write(head+'\n')
+        f.write('-'*len(head)+'\n')
+        for row in self.Diagnostics():
+            f.write(('%'+str(width)+'s |')%row['param']+' %12.4g | %12.4g | %8.5f | %.4g\n'%(row['tau'],row['ess'],row['rhat'],n/row['tau']))
+        f.write('-'*len(head))
+        f.close()
+        return self.Diagnostics()
+
+    def Pearson(self,p1,p2):
+        '''Pearson's correlation coefficient of two params (from cached correlation matrix)'''
+        return self.Moments()['corr'][self.pars.index(p1),self.pars.index(p2)]
+
+    def Hist2D(self,nbins=20):
+        '''2D histograms for all pairs of params calculated in one pass through chain (cached)
+        output - histograms (dict with keys (i,j), i<j - indices of params) and edges of bins for all params'''
+        if not nbins in self._hist2d:
+            mom=self.Moments()
+            d=len(self.pars)
+            width=mom['max']-mom['min']
+            width[width==0]=1
+            edges=mom['min'][:,np.newaxis]+width[:,np.newaxis]*np.linspace(0,1,nbins+1)
+            hist={(i,j):np.zeros(nbins*nbins) for i in range(d) for j in range(i+1,d)}
+            for x in self._Chunks():
+                ind=np.clip(((x-mom['min'])/width*nbins).astype(int),0,nbins-1)
+                for (i,j) in hist: hist[(i,j)]+=np.bincount(ind[:,i]*nbins+ind[:,j],minlength=nbins*nbins)
+            for key in hist: hist[key]=hist[key].reshape((nbins,nbins))
+            self._hist2d[nbins]=(hist,edges)
+        return self._hist2d[nbins]
 
 
     def AllParams(self,eps=False):
@@ -85,6 +298,7 @@ class InfoMC():
         mpl.close('all')
 
         self.CorrTab()
+        self.DiagTab()
 
         gc.collect()  #cleaning RAM...
 
@@ -99,10 +313,11 @@ class InfoMC():
             for p in self.pars: head+=(" %"+str(colWidth[p])+"s |")%p
             f.write(head+'\n')
             f.write("-"*len(head)+'\n')
+            corr=self.Moments()['corr']
             for i2,p2 in enumerate(self.pars):
                 f.write(("%"+str(max(colWidth.values()))+"s |")%(p2))
                 for i1,p1 in enumerate(self.pars):
-                    coe=pearsonr(self.flat[:,i1],self.flat[:,i2])[0]
+                    coe=corr[i1,i2]
                     f.write(" % 8.6f |"%coe)
                 f.write('\n')
             f.write("-" * len(head))
@@ -129,7 +344,7 @@ class InfoMC():
         if path is None: path=self.path
         f=open(path+name+'_stat.txt','w')
 
-        sampleArgs=self.ta['sampleArgs'].item()
+        sampleArgs=self.sampleArgs
 
         f.write('iter: '+str(sampleArgs['iters'])+'\n')
         f.write('burn: '+str(sampleArgs['burn'])+'\n')
@@ -139,33 +354,34 @@ class InfoMC():
         f.write(name+'\n')
         i=self.pars.index(name)
         m=np.argmax(self.flatprob)
+        row=self.Summary()[i]
         f.write('max. prob.: '+str(self.flat[m,i])+'\n')
-        f.write('mean: '+str(np.mean(self.flat[:,i]))+'\n')
-        f.write('median: '+str(np.median(self.flat[:,i]))+'\n')
-        f.write('STD: '+str(np.std(self.flat[:,i]))+'\n')
-        f.write('1sigma - 68%: '+str(np.quantile(self.flat[:,i],1-0.6827))+' ... '+str(np.quantile(self.flat[:,i],0.6827))+'\n')
-        f.write('2sigma - 95%: '+str(np.quantile(self.flat[:,i],1-0.9545))+' ... '+str(np.quantile(self.flat[:,i],0.9545))+'\n')
-        f.write('3sigma - 99%: '+str(np.quantile(self.flat[:,i],1-0.9973))+' ... '+str(np.quantile(self.flat[:,i],0.9973))+'\n')
+        f.write('mean: '+str(row['mean'])+'\n')
+        f.write('median: '+str(row['median'])+'\n')
+        f.write('STD: '+str(row['std'])+'\n')
+        f.write('1sigma - 68%: '+str(row['1sigma_lo'])+' ... '+str(row['1sigma_hi'])+'\n')
+        f.write('2sigma - 95%: '+str(row['2sigma_lo'])+' ... '+str(row['2sigma_hi'])+'\n')
+        f.write('3sigma - 99%: '+str(row['3sigma_lo'])+' ... '+str(row['3sigma_hi'])+'\n')
         f.close()
 
 
-    def Corner(self,params=None):
-        '''plot corner plot'''
-        values=[]
-        tr=[]
+    def Corner(self,params=None,thin=1):
+        '''plot corner plot ("thin" - use only every "thin"-th sample)'''
         if params is None: params=self.pars
-        for p in params:
-            i=self.pars.index(p)
-            values.append(np.median(self.flat[:,i]))
-            tr.append(self.flat[:,i])
-        fig=corner.corner(np.array(tr).transpose(),labels=params,truths=values,quantiles=[1-0.6827,0.5,0.6827],show_titles=True)
+        if list(params)==self.pars: tr=self.Flat(thin)   #without copy of chain
+        else: tr=self.Flat(thin)[:,[self.pars.index(p) for p in params]]
+        values=[self.Summary()['median'][self.pars.index(p)] for p in params]
+        #ranges of params from cached statistics - corner does not need to go through chain again
+        mom=self.Moments()
+        ranges=[(mom['min'][self.pars.index(p)],mom['max'][self.pars.index(p)]) for p in params]
+        ranges=[r if r[1]>r[0] else 1. for r in ranges]
+        fig=corner.corner(tr,labels=params,truths=values,range=ranges,quantiles=[1-0.6827,0.5,0.6827],show_titles=True)
         return fig
 
     def Hist(self,param,new_fig=True,label=True):
         '''plot histogram for one parameter'''
-        i=self.pars.index(param)
         if new_fig: fig=mpl.figure()
-        mpl.hist(self.flat[:,i],bins=20,color='k')
+        mpl.hist(self.Column(param),bins=20,color='k')
         if label: mpl.xlabel(param)
         mpl.gca().ticklabel_format(useOffset=False)
         if new_fig: return fig
@@ -185,11 +401,10 @@ class InfoMC():
         fig.tight_layout()
         return fig
 
-    def Dev(self,param,new_fig=True,label=True):
-        '''plot deviance for one parameter'''
-        i=self.pars.index(param)
+    def Dev(self,param,new_fig=True,label=True,thin=1):
+        '''plot deviance for one parameter ("thin" - use only every "thin"-th sample)'''
         if new_fig: fig=mpl.figure()
-        mpl.plot(self.flat[:,i],self.flatprob,'k.',alpha=0.2)
+        mpl.plot(self.Column(param,thin),self.FlatProb(thin),'k.',alpha=0.2)
         if label:
             mpl.xlabel(param)
             mpl.ylabel('log probability')
@@ -197,26 +412,25 @@ class InfoMC():
         mpl.gca().ticklabel_format(useOffset=False)
         if new_fig: return fig
 
-    def Devs(self,params=None):
+    def Devs(self,params=None,thin=1):
         '''plot deviances for multiple parameters'''
         if params is None: params=self.pars
 
-        if len(params)==1: return self.Dev(params[0])
-        if isinstance(params,str): return self.Dev(params)
+        if len(params)==1: return self.Dev(params[0],thin=thin)
+        if isinstance(params,str): return self.Dev(params,thin=thin)
 
         fig=mpl.figure()
         cols,rows = _plotsizeHelper(len(params))
         for i,p in enumerate(params):
             mpl.subplot(rows, cols, i + 1)
-            self.Dev(p,new_fig=False)
+            self.Dev(p,new_fig=False,thin=thin)
         fig.tight_layout()
         return fig
 
     def Acorr(self,param,new_fig=True,label=True):
         '''autocorrelation plot for one parameter'''
-        i=self.pars.index(param)
         if new_fig: fig=mpl.figure()
-        acorr=emcee.autocorr.function_1d(self.flat[:,i])
+        acorr=emcee.autocorr.function_1d(self.Column(param))
         x=np.arange(-len(acorr),len(acorr))
         acorr=np.append(acorr[::-1],acorr)
         mpl.plot(x,acorr,'k-',lw=1)
@@ -230,8 +444,8 @@ class InfoMC():
         '''plot traces for one param'''
         i=self.pars.index(param)
         if new_fig: fig=mpl.figure()
-        for j in range(self.ta['chain'].shape[0]):
-            mpl.plot(self.ta['chain'][j,:,i],'k-',alpha=0.2)
+        for j in range(self.chain.shape[1]):
+            mpl.plot(self.chain[:,j,i],'k-',alpha=0.2)
         if label: mpl.ylabel(param)
         mpl.gca().ticklabel_format(useOffset=False)
         if new_fig: return fig
@@ -255,11 +469,12 @@ class InfoMC():
         fig.tight_layout()
         return fig
 
-    def Corr(self,params=None):
-        '''plot of Correlations between params'''
+    def Corr(self,params=None,thin=1):
+        '''plot of Correlations between params ("thin" - use only every "thin"-th sample)'''
         if params is None: params=self.pars
         traces={}
-        for p in params: traces[p]=self.flat[:,self.pars.index(p)]
+        for p in params: traces[p]=self.Column(p,thin)
+        mom=self.Moments()
         fontmap={1:10,2:8,3:6,4:5,5:4}
         k=1
         n=len(traces)
@@ -271,14 +486,14 @@ class InfoMC():
                     tr1=traces[params[j]]
                     tr2=traces[params[i]]
 
-                    x_s=tr1.mean()
-                    y_s=tr2.mean()
+                    x_s=mom['mean'][self.pars.index(params[j])]
+                    y_s=mom['mean'][self.pars.index(params[i])]
 
                     mpl.subplot(n-1,n-1,k)
                     mpl.xlabel(params[j],fontsize='x-small')
                     mpl.ylabel(params[i],fontsize='x-small')
                     tlabels=mpl.gca().get_xticklabels()
-                    mpl.title("Pearson's R: %1.5f" % pearsonr(tr1,tr2)[0],fontsize='x-small')
+                    mpl.title("Pearson's R: %1.5f" % self.Pearson(params[j],params[i]),fontsize='x-small')
                     if n>6:
                         mpl.setp(tlabels,'fontsize',3)
                         tlabels=mpl.gca().get_yticklabels()
@@ -295,24 +510,30 @@ class InfoMC():
         return fig
 
 
-    def ConfidInt(self,nbins=20,points=True,levels=None,params=None):
-        '''plot of Confidence Regions for 1 sigma=0.6827 and 2 sigma = 0.9545 (or 3 sigma = 0.9973)'''
+    def ConfidInt(self,nbins=20,points=True,levels=None,params=None,thin=1):
+        '''plot of Confidence Regions for 1 sigma=0.6827 and 2 sigma = 0.9545 (or 3 sigma = 0.9973)
+        histograms are calculated from whole chain ("thin" - plot only every "thin"-th sample)'''
         if params is None: params=self.pars
         if levels is None: levels=[0.6827,0.9545]
         traces={}
-        for p in params: traces[p]=self.flat[:,self.pars.index(p)]
+        if points:
+            for p in params: traces[p]=self.Column(p,thin)
+        mom=self.Moments()
+        hist,edges=self.Hist2D(nbins)
         fontmap={1:10,2:8,3:6,4:5,5:4}
         k=1
-        n=len(traces)
+        n=len(params)
 
         fig=mpl.figure()
         for j in range(n):
             for i in range(n):
                 if i>j:
-                    tr1=traces[params[j]]
-                    tr2=traces[params[i]]
-
-                    L,xbins,ybins=np.histogram2d(tr1,tr2,nbins)
+                    i1=self.pars.index(params[j])
+                    i2=self.pars.index(params[i])
+                    if i1<i2: L=np.array(hist[(i1,i2)])
+                    else: L=hist[(i2,i1)].T.copy()
+                    xbins=edges[i1]
+                    ybins=edges[i2]
                     L[L==0]=1e-16
                     shape=L.shape
                     L=L.ravel()
@@ -324,8 +545,8 @@ class InfoMC():
                     ybins=0.5*(ybins[1:]+ybins[:-1])
                     sigma=L_cumsum[i_unsort].reshape(shape)
 
-                    x_s=tr1.mean()
-                    y_s=tr2.mean()
+                    x_s=mom['mean'][i1]
+                    y_s=mom['mean'][i2]
 
                     mpl.subplot(n-1,n-1,k)
                     mpl.xlabel(params[j],fontsize='x-small')
@@ -340,7 +561,7 @@ class InfoMC():
                         tlabels=mpl.gca().get_yticklabels()
                         mpl.setp(tlabels,'fontsize',fontmap[n-1])
                     mpl.contour(xbins,ybins,sigma.T,levels=levels,colors=['lime','magenta'])
-                    if points: mpl.plot(tr1,tr2,'k.',ms=2,zorder=-10)
+                    if points: mpl.plot(traces[params[j]],traces[params[i]],'k.',ms=2,zorder=-10)
                     mpl.plot(x_s,y_s,'r.',ms=10)
                 if not i==j: k+=1
                 gc.collect() #cleaning RAM...
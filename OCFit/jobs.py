@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+
+#queue of fitting jobs run on background by job server (replacement of single scripts ocfit-bg.py)
+#version 0.2.2
+#update: 18.10.2026
+# (c) Pavol Gajdos, 2018-2026
+
+#queue is folder with files (no running server is needed for submitting of jobs):
+#   <id>.job.json - job (saved OCFit class, fitting procedure, priority)
+#   <id>.status.json - status of job (queued / running / done / failed / cancelled) and progress of fitting
+#   <id>.cancel - request for cancellation of running job
+#   <id>.log - output of fitting
+#   server.json - heartbeat of running server
+
+import os
+import sys
+import glob
+import json
+import uuid
+import multiprocessing
+import traceback
+from time import time,sleep,strftime
+
+from .OC_class import OCFitLoad
+from .batch import RunPlan,_SaveJSON
+
+queue_default=os.path.join(os.path.expanduser('~'),'.ocfit','queue')   #default folder of queue
+
+def BackgroundPlan(genGA,sizeGA,nMC,burnMC,binnMC,save=False):
+    '''fitting procedure used for fitting on background - GA and/or MCMC (with scaled errors)
+    save - save fitting samples to databases (names "-ga.tmp" and "-mcmc.tmp" are added to prefix given in RunPlan)
+    '''
+    plan=[]
+    if genGA*sizeGA>0:
+        plan.append(['GA',{'generation':int(genGA),'size':int(sizeGA)}])
+        if save: plan[-1][1]['db']='-ga.tmp'
+    if nMC>0:
+        plan.append(['Weight',{}])
+        plan.append(['MCMC',{'n_iter':nMC,'burn':burnMC,'binn':binnMC}])
+        if save: plan[-1][1]['db']='-mcmc.tmp'
+    return plan
+
+def _Path(queue,job,ext):
+    '''name of file of job in queue'''
+    return os.path.join(queue,job+'.'+ext)
+
+def _ReadJSON(path):
+    with open(path,'r') as f: return json.load(f)
+
+def Submit(file,plan,queue=None,priority=0):
+    '''add job to queue - fitting of OCFit class saved in "file" according to fitting procedure "plan" (see batch.RunPlan)
+    fitted class is saved back to "file"; jobs with higher priority are run first
+    output - id of job
+    '''
+    if queue is None: queue=queue_default
+    if not os.path.isdir(queue): os.makedirs(queue)
+    job=strftime('%Y%m%d%H%M%S')+'-'+uuid.uuid4().hex[:6]
+    _SaveJSON({'status':'queued'},_Path(queue,job,'status.json'))
+    _SaveJSON({'id':job,'file':os.path.abspath(file),'plan':plan,'priority':priority,'submitted':time()},_Path(queue,job,'job.json'))
+    return job
+
+def Status(job=None,queue=None):
+    '''status of job (or of all jobs in queue) - dict with job, status and progress of fitting'''
+    if queue is None: queue=queue_default
+    if job is None:
+        jobs=[os.path.basename(f)[:-9] for f in glob.glob(os.path.join(queue,'*.job.json'))]
+        return sorted([Status(j,queue) for j in jobs],key=lambda x: x['submitted'])
+    info=_ReadJSON(_Path(queue,job,'job.json'))
+    try: info.update(_ReadJSON(_Path(queue,job,'status.json')))
+    except (IOError,ValueError): info['status']='unknown'
+    return info
+
+def Cancel(job,queue=None):
+    '''cancel job - queued job is not started, running job is stopped (fitted class is not saved)'''
+    if queue is None: queue=queue_default
+    if Status(job,queue)['status']=='queued': _SaveJSON({'status':'cancelled'},_Path(queue,job,'status.json'))
+    open(_Path(queue,job,'cancel'),'w').close()
+
+def Remove(job,queue=None):
+    '''remove finished job from queue'''
+    if queue is None: queue=queue_default
+    if Status(job,queue)['status'] in ['queued','running']:
+        raise ValueError('Job "'+job+'" is not finished! Cancel it before removing.')
+    for f in glob.glob(os.path.join(queue,job+'.*')): os.remove(f)
+
+def ServerRunning(queue=None,timeout=10):
+    '''check if job server is running (heartbeat is not older than "timeout" seconds)'''
+    if queue is None: queue=queue_default
+    try: return time()-_ReadJSON(os.path.join(queue,'server.json'))['time']<timeout
+    except (IOError,ValueError,KeyError): return False
+
+def StopServer(queue=None):
+    '''stop job server - new jobs are not started, server ends after finishing of running jobs'''
+    if queue is None: queue=queue_default
+    open(os.path.join(queue,'server.stop'),'w').close()
+
+def _RunQueued(queue,job):
+    '''run job in separate process - progress is saved to status file, output to log file'''
+    info=_ReadJSON(_Path(queue,job,'job.json'))
+    log=open(_Path(queue,job,'log'),'w')
+    sys.stdout=log
+    sys.stderr=log
+    status={'status':'running','start':time(),'pid':os.getpid(),'progress':{}}
+    _SaveJSON(status,_Path(queue,job,'status.json'))
+    last=[0]
+
+    def Progress(progress):
+        '''save progress of fitting (max. once per second) and check request for cancellation'''
+        if time()-last[0]>1:
+            last[0]=time()
+            status['progress']=dict(progress)
+            if 'generation' in progress: done=progress['generation']/float(progress['generations'])
+            else: done=progress['iteration']/float(progress['iterations'])
+            if done>0: status['eta']=progress['time']*(1-done)/done
+            _SaveJSON(status,_Path(queue,job,'status.json'))
+        return os.path.isfile(_Path(queue,job,'cancel'))
+
+    try:
+        name=info['file']
+        fit=OCFitLoad(name)
+        status['fitInfo']=RunPlan(fit,info['plan'],name[:name.rfind('.')],Progress)
+        if os.path.isfile(_Path(queue,job,'cancel')): status['status']='cancelled'
+        else:
+            fit.Save(info['file'])
+            status['status']='done'
+            status['chi2']=fit.Chi2(fit.params)
+    except Exception as e:
+        status['status']='failed'
+        status['error']=repr(e)
+        traceback.print_exc()
+    status['end']=time()
+    status.pop('eta',None)
+    _SaveJSON(status,_Path(queue,job,'status.json'))
+    log.close()
+
+class JobServer():
+    '''server running jobs from queue on bounded number of processes'''
+    def __init__(self,queue=None,workers=1,grace=30):
+        '''queue - folder of queue
+        workers - max. number of jobs run at once
+        grace - time (in seconds) for stopping of cancelled job, after it the process is terminated
+        '''
+        if queue is None: queue=queue_default
+        if not os.path.isdir(queue): os.makedirs(queue)
+        self.queue=queue
+        self.workers=int(workers)
+        self.grace=grace
+        self.running={}   #running jobs - id: [process, time of cancellation]
+
+    def _Heartbeat(self):
+        _SaveJSON({'pid':os.getpid(),'time':time(),'workers':self.workers,'running':list(self.running)},
+                  os.path.join(self.queue,'server.json'))
+
+    def _Queued(self):
+        '''queued jobs sorted by priority and time of submitting'''
+        jobs=[j for j in Status(queue=self.queue) if j['status']=='queued' and not j['id'] in self.running]
+        return sorted(jobs,key=lambda x: (-x['priority'],x['submitted']))
+
+    def Step(self):
+        '''check running jobs and start new ones (one step of server loop)'''
+        for job in list(self.running):
+            proc,cancel=self.running[job]
+            if not proc.is_alive():
+                proc.join()
+                if Status(job,self.queue)['status']=='running':
+                    #process crashed or was terminated
+                    if cancel is None: status={'status':'failed','error':'Process ended with exit code '+str(proc.exitcode)}
+                    else: status={'status':'cancelled'}
+                    status['end']=time()
+                    _SaveJSON(status,_Path(self.queue,job,'status.json'))
+                del self.running[job]
+            elif os.path.isfile(_Path(self.queue,job,'cancel')):
+                if cancel is None: self.running[job][1]=time()
+                elif time()-cancel>self.grace: proc.terminate()   #job was not stopped by itself
+
+        if not os.path.isfile(os.path.join(self.queue,'server.stop')):
+            for job in self._Queued()[:max(self.workers-len(self.running),0)]:
+                proc=multiprocessing.Process(target=_RunQueued,args=(self.queue,job['id']))
+                proc.start()
+                self.running[job['id']]=[proc,None]
+        self._Heartbeat()
+
+    def Run(self,poll=1.):
+        '''run server until it is stopped (see StopServer)'''
+        stop=os.path.join(self.queue,'server.stop')
+        if os.path.isfile(stop): os.remove(stop)
+        while not (os.path.isfile(stop) and len(self.running)==0):
+            self.Step()
+            sleep(poll)
+        os.remove(stop)
+        os.remove(os.path.join(self.queue,'server.json'))
+
+
+if __name__=='__main__':
+    #command line:
+    #   python3 -m OCFit.jobs server [queue] [workers]
+    #   python3 -m OCFit.jobs submit file genGA sizeGA nMC burnMC binnMC save_fitting_sample [priority] [queue]
+    #   python3 -m OCFit.jobs status [queue]
+    #   python3 -m OCFit.jobs cancel id [queue]
+    #   python3 -m OCFit.jobs stop [queue]
+    args=sys.argv[1:]
+    if len(args)==0:
+        print('Usage: python3 -m OCFit.jobs server|submit|status|cancel|stop ...')
+        sys.exit(1)
+    if args[0]=='server':
+        queue=None
+        workers=1
+        if len(args)>1: queue=args[1]
+        if len(args)>2: workers=int(args[2])
+        JobServer(queue,workers).Run()
+    elif args[0]=='submit':
+        name=args[1]
+        plan=BackgroundPlan(int(args[2]),int(args[3]),float(args[4]),float(args[5]),float(args[6]),bool(int(args[7])))
+        priority=0
+        queue=None
+        if len(args)>8: priority=int(args[8])
+        if len(args)>9: queue=args[9]
+        print(Submit(name,plan,queue,priority))
+    elif args[0]=='status':
+        queue=None
+        if len(args)>1: queue=args[1]
+        for job in Status(queue=queue):
+            line=job['id']+'  '+job['status'].ljust(10)+'  '+job['file']
+            if job['status']=='running' and 'generation' in job.get('progress',{}):
+                line+='  '+job['progress']['method']+' '+str(job['progress']['generation'])+'/'+str(job['progress']['generations'])
+            elif job['status']=='running' and 'iteration' in job.get('progress',{}):
+                line+='  MCMC '+str(job['progress']['iteration'])+'/'+str(job['progress']['iterations'])
+            if 'eta' in job: line+='  ETA '+str(round(job['eta']))+' s'
+            print(line)
+    elif args[0]=='cancel':
+        queue=None
+        if len(args)>2: queue=args[2]
+        Cancel(args[1],queue)
+    elif args[0]=='stop':
+        queue=None
+        if len(args)>1: queue=args[1]
+        StopServer(queue)
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+#compiled kernels of O-C models (optional backend using numba)
+#version 0.2.2
+# (c) Pavol Gajdos, 2018-2024
+
+import numpy as np
+
+try:
+    import numba
+    available=True
+    jit=numba.njit
+    prange=numba.prange
+except ModuleNotFoundError:
+    #numba not installed -> kernels could not be compiled, OCFit uses NumPy backend
+    available=False
+    def jit(*args,**kwargs):
+        return lambda f: f
+    prange=range
+
+#some constants (same as in OC_class)
+AU=149597870700 #astronomical unit in meters
+c=299792458     #velocity of light in meters per second
+day=86400.    #number of seconds in day
+
+#models: name -> (id of model in kernels, order of parameters, epoch is necessary)
+models={'LiTE3':(0,['a_sin_i3','e3','w3','t03','P3'],False),
+        'LiTE34':(1,['a_sin_i3','e3','w3','t03','P3','a_sin_i4','e4','w4','t04','P4'],False),
+        'LiTE3Quad':(2,['t0','P','Q','a_sin_i3','e3','w3','t03','P3'],True),
+        'LiTE34Quad':(3,['t0','P','Q','a_sin_i3','e3','w3','t03','P3','a_sin_i4','e4','w4','t04','P4'],True),
+        'AgolInPlanet':(4,['P','a','w','e','mu3','r3','w3','t03','P3'],False),
+        'AgolInPlanetLin':(5,['t0','P','a','w','e','mu3','r3','w3','t03','P3'],True),
+        'AgolExPlanet':(6,['P','mu3','e3','t03','P3'],False),
+        'AgolExPlanetLin':(7,['t0','P','mu3','e3','t03','P3'],True),
+        'Apsidal':(8,['t0','P','w0','dw','e'],True),
+        'ApsidalQuad':(9,['t0','P','Q','w0','dw','e'],True),
+        'LiTE3Apsidal':(10,['a_sin_i3','e3','w3','t03','P3','t0','P','w0','dw','e'],True),
+        'LiTE3ApsidalQuad':(11,['a_sin_i3','e3','w3','t03','P3','t0','P','Q','w0','dw','e'],True)}
+
+
+@jit(cache=True)
+def _kepler(M,e):
+    '''solving Kepler Equation for one point - Newton-Raphson (e<0.9) or Markley (e>=0.9)'''
+    pi=np.pi
+    M=M%(2*pi)
+    if e<0.9:
+        E=M+e*np.sin(M)/np.sqrt(1-2*e*np.cos(M)+e**2)  #starting formula S9
+        for i in range(100):
+            dE=(E-e*np.sin(E)-M)/(1-e*np.cos(E))
+            E-=dE
+            if not abs(dE)>1e-10: break
+        return E%(2*pi)
+
+    #Markley (1995)
+    pi2=pi**2
+    flip=M>pi
+    if flip: M=2*pi-M
+    if np.round(M,14)==0: return 0.
+    if np.round(M,14)==np.round(pi,14): return pi
+    alpha=(3.*pi2+1.6*pi*(pi-abs(M))/(1.+e))/(pi2-6.)
+    d=3*(1-e)+alpha*e
+    r=3*alpha*d*(d-1+e)*M+M**3
+    q=2*alpha*d*(1-e)-M**2
+    w=(abs(r)+np.sqrt(q**3+r**2))**(2./3.)
+    E1=(2*r*w/(w**2+w*q+q**2)+M)/d
+    s=e*np.sin(E1)
+    f0=E1-s-M
+    f1=1-e*np.cos(E1)
+    f2=s
+    f3=1-f1
+    f4=-f2
+    d3=-f0/(f1-0.5*f0*f2/f1)
+    d4=-f0/(f1+0.5*d3*f2+(d3**2)*f3/6.)
+    d5=-f0/(f1+0.5*d4*f2+d4**2*f3/6.+d4**3*f4/24.)
+    E=E1+d5
+    if flip: E=2*pi-E
+    return E
+
+@jit(cache=True)
+def _lite(t,a_sin_i,e,w,t0,P):
+    '''Light-Time effect (Irwin, 1952) for one point'''
+    E=_kepler(2*np.pi/P*(t-t0),e)
+    nu=2*np.arctan(np.sqrt((1+e)/(1-e))*np.tan(E/2))
+    return a_sin_i*AU/c*((1-e**2)/(1+e*np.cos(nu))*np.sin(nu+w)+e*np.sin(w))/day
+
+@jit(cache=True)
+def _agolIn(t,P,a,w,e,mu3,r3,w3,t03,P3):
+    '''TTV - inner planet (Agol et al., 2005) for one point'''
+    nu=2*np.pi/P3*(t-t03)
+    return -P*mu3*r3*np.cos(nu+w3)*np.sqrt(1-e**2)/(2*np.pi*a*(1-e*np.sin(w)))
+
+@jit(cache=True)
+def _agolEx(t,P,mu3,e3,t03,P3):
+    '''TTV - exterior planet (Agol et al., 2005) for one point'''
+    M=(2*np.pi/P3*(t-t03))%(2*np.pi)
+    E=_kepler(M,e3)
+    nu=(2*np.arctan(np.sqrt((1+e3)/(1-e3))*np.tan(E/2)))%(2*np.pi)
+    return mu3/(2*np.pi*(1-mu3))*P**2/P3*(1-e3**2)**(-3./2.)*(nu-M+e3*np.sin(nu))
+
+@jit(cache=True)
+def _apsidal(E,min_type,P,w0,dw,e):
+    '''Apsidal motion (Gimenez&Bastero,1995) for one point - without linear ephemeris'''
+    nu=-(w0+dw*E)+np.pi/2
+    b=e/(1+np.sqrt(1-e**2))
+    sq=np.sqrt(1-e**2)
+    s=0.
+    for n in range(1,10):
+        tmp=(-b)**n*(1/n+sq)*np.sin(n*nu)
+        if min_type==1 and n%2: s-=tmp   #secondary
+        else: s+=tmp
+    return P/np.pi*s
+
+@jit(cache=True)
+def _point(model,p,t,E,min_type,t0L,PL):
+    '''value of model O-C for one point; p - all parameters of model in order given by "models"'''
+    if model==0: return _lite(t,p[0],p[1],p[2],p[3],p[4])
+    if model==1: return _lite(t,p[0],p[1],p[2],p[3],p[4])+_lite(t,p[5],p[6],p[7],p[8],p[9])
+    if model==4: return _agolIn(t,p[0],p[1],p[2],p[3],p[4],p[5],p[6],p[7],p[8])
+    if model==6: return _agolEx(t,p[0],p[1],p[2],p[3],p[4])
+
+    #same order of operations as in NumPy models -> same rounding errors
+    lin=t0L+PL*E   #given linear ephemeris
+    if model==2: return (p[0]+p[1]*E+p[2]*E**2)+_lite(t,p[3],p[4],p[5],p[6],p[7])-lin
+    if model==3:
+        return (p[0]+p[1]*E+p[2]*E**2)+_lite(t,p[3],p[4],p[5],p[6],p[7])+_lite(t,p[8],p[9],p[10],p[11],p[12])-lin
+    if model==5: return (p[0]+p[1]*E-lin)+_agolIn(t,p[1],p[2],p[3],p[4],p[5],p[6],p[7],p[8],p[9])
+    if model==7: return (p[0]+p[1]*E)+_agolEx(t,p[1],p[2],p[3],p[4],p[5])-lin
+    if model==8: return _apsidal(E,min_type,p[1],p[2],p[3],p[4])+(p[0]+p[1]*E)-lin
+    if model==9: return (_apsidal(E,min_type,p[1],p[3],p[4],p[5])+(p[0]+p[1]*E)-lin)+p[2]*E**2
+    if model==10:
+        return _lite(t,p[0],p[1],p[2],p[3],p[4])+(_apsidal(E,min_type,p[6],p[7],p[8],p[9])+(p[5]+p[6]*E)-lin)
+    if model==11:
+        return _lite(t,p[0],p[1],p[2],p[3],p[4])+(_apsidal(E,min_type,p[6],p[8],p[9],p[10])+(p[5]+p[6]*E)-lin)+p[7]*E**2
+    return np.nan
+
+@jit(cache=True,parallel=True)
+def Model(model,params,t,epoch,min_type,t0L,PL):
+    '''model O-C for matrix of parameters (one row = one set of all parameters of model)
+    output - matrix (sets of parameters x data points)'''
+    out=np.empty((params.shape[0],t.shape[0]))
+    for i in prange(params.shape[0]):
+        for j in range(t.shape[0]):
+            out[i,j]=_point(model,params[i],t[j],epoch[j],min_type[j],t0L,PL)
+    return out
+
+@jit(cache=True,parallel=True)
+def Chi2(model,params,t,epoch,min_type,t0L,PL,oc,err):
+    '''chi2 errors for matrix of parameters (one row = one set of all parameters of model)
+    model values are not stored - only sum of squares of residua is calculated'''
+    chi2=np.empty(params.shape[0])
+    for i in prange(params.shape[0]):
+        s=0.
+        for j in range(t.shape[0]):
+            r=(_point(model,params[i],t[j],epoch[j],min_type[j],t0L,PL)-oc[j])/err[j]
+            s+=r*r
+        chi2[i]=s
+    return chi2
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+#registry of O-C models for OCFit
+#version 0.2.2
+# (c) Pavol Gajdos, 2018-2024
+
+import numpy as np
+
+models={}   #registered models: name -> ModelSpec
+
+class ModelSpec():
+    '''O-C model available for fitting'''
+    def __init__(self,name,params,func,jac=None,apsidal=False):
+        '''name - name of model
+        params - list of names of parameters in order of arguments of "func"
+        func - function calculating model O-C: func(ocfit,t,*values) or func(ocfit,t,*values,min_type) if "apsidal"
+        jac - function calculating partial derivatives of model (same arguments as "func"),
+              returns list of arrays (one for each parameter in order of "params")
+        apsidal - model depends on type of minima (primary / secondary)
+        '''
+        self.name=name
+        self.params=list(params)
+        self.func=func
+        self.jac=jac
+        self.apsidal=apsidal
+        self.kernel=None   #compiled kernel - (id, order of params, epoch is necessary); only for built-in models
+
+    def _Args(self,fit,names,min_type):
+        '''positions of fitted parameters "names" and values of fixed parameters'''
+        index=[]
+        fixed=[]
+        for p in self.params:
+            if p in names:
+                index.append(names.index(p))
+                fixed.append(None)
+            elif p in fit.params:
+                index.append(-1)
+                fixed.append(fit.params[p])
+            else: raise KeyError('Value of parameter "'+p+'" of model "'+self.name+'" is not given!')
+        if self.apsidal:
+            if min_type is None: min_type=fit._min_type
+            extra=(min_type,)
+        else: extra=()
+        return index,fixed,extra
+
+    def Bind(self,fit,names,t=None,min_type=None):
+        '''pre-bound evaluation function of model for OCFit object "fit"
+        names - list of names of free parameters; other parameters are fixed to values in "fit.params"
+        t - times (if not given -> times from "fit")
+        min_type - type of minima (if not given -> types from "fit")
+        return: function of flat array of values of free parameters (in order given by "names");
+                for matrix of values (one row = one set of values) it returns matrix (sets x data points)
+        '''
+        if t is None: t=fit.t
+        index,fixed,extra=self._Args(fit,list(names),min_type)
+        func=self.func
+
+        def evaluate(values):
+            values=np.asarray(values,dtype=float)
+            if values.ndim>1: values=values.T[:,:,np.newaxis]   #params as columns -> broadcasting
+            p=[values[i] if i>=0 else x for i,x in zip(index,fixed)]
+            return func(fit,t,*p,*extra)
+
+        return evaluate
+
+    def BindJac(self,fit,names,t=None,min_type=None):
+        '''pre-bound function of partial derivatives of model with respect to free parameters "names"
+        return: function of flat array of values of free parameters, which gives matrix (data points x free parameters)
+        '''
+        if self.jac is None:
+            raise NotImplementedError('Analytic derivatives of model "'+self.name+'" are not available!')
+        if t is None: t=fit.t
+        names=list(names)
+        index,fixed,extra=self._Args(fit,names,min_type)
+        cols=[self.params.index(p) for p in names]   #derivatives of free parameters
+        jac=self.jac
+
+        def evaluate(values):
+            values=np.asarray(values,dtype=float)
+            p=[values[i] if i>=0 else x for i,x in zip(index,fixed)]
+            der=jac(fit,t,*p,*extra)
+            return np.column_stack([der[i]*np.ones(t.shape) for i in cols])
+
+        return evaluate
+
+
+def RegisterModel(name,params,func,jac=None,apsidal=False):
+    '''register new model of O-C (or replace existing one) -> it is available in OCFit
+    name - name of model (used as "OCFit.model")
+    params - list of names of parameters in order of arguments of "func"
+    func - function calculating model O-C: func(ocfit,t,*values) or func(ocfit,t,*values,min_type) if "apsidal";
+           values of parameters could be floats or columns (np.array with shape (n,1)), output has to be broadcasted
+    jac - (optional) function calculating partial derivatives of model (same arguments as "func"),
+          returns list of arrays (one for each parameter in order of "params")
+    apsidal - model depends on type of minima (primary / secondary)
+    '''
+    models[name]=ModelSpec(name,params,func,jac,apsidal)
+    return models[name]
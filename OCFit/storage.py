@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+
+#storage of fitting details on disk (saved continuously during fitting) and binary files with saved classes
+#version 0.2.2
+# (c) Pavol Gajdos, 2018-2024
+
+import os
+import json
+import zipfile
+from time import time
+
+import numpy as np
+
+chunk_size=2**20   #max. number of values saved to disk at once
+flush_time=1.   #max. time (in seconds) between writing of GA / DE generations to disk
+
+def IsDB(path,kind=None):
+    '''check if file is database (JSON header) created by this module (of given kind)'''
+    if not os.path.isfile(path): return False
+    with open(path,'rb') as f:
+        if not f.read(1)==b'{': return False
+    try:
+        with open(path,'r') as f: header=json.load(f)
+    except ValueError: return False
+    if kind is None: return 'format' in header
+    return header.get('format')==kind
+
+
+class ChainDB():
+    '''chain from MCMC fitting saved continuously on disk
+    db file - header in JSON (names of parameters, settings of sampling, number of saved samples)
+    chain and log probability - in .npy files (memory-mapped), shape (samples, walkers, params) and (samples, walkers)
+    '''
+    kind='OCFit-MCMC'
+
+    def __init__(self,path,mode='r'):
+        '''path - name of db file; mode - "r" (read only) or "r+" (appending of samples)'''
+        self.path=path
+        self.mode=mode
+        self.header={}
+        self._chain=None
+        self._lnp=None
+        if IsDB(path,self.kind): self._Load()
+
+    def _Load(self):
+        '''load header (data files are opened only when they are used - see _Open)'''
+        with open(self.path,'r') as f: self.header=json.load(f)
+        self._chain=None
+        self._lnp=None
+
+    def _Open(self):
+        '''open data files as memmap (if they are not open yet)'''
+        if self._chain is None:
+            folder=os.path.dirname(self.path)
+            self._chain=np.load(os.path.join(folder,self.header['chain']),mmap_mode=self.mode)
+            self._lnp=np.load(os.path.join(folder,self.header['lnp']),mmap_mode=self.mode)
+
+    def _SaveHeader(self):
+        '''rewrite header (atomically - old header is valid until new one is written)'''
+        with open(self.path+'.tmp','w') as f: json.dump(self.header,f)
+        os.replace(self.path+'.tmp',self.path)
+
+    def Exists(self):
+        '''db file with chain exists'''
+        return len(self.header)>0
+
+    @property
+    def pnames(self):
+        '''names of fitted parameters'''
+        return self.header['pnames']
+
+    @property
+    def sampleArgs(self):
+        '''settings of sampling (burn, binn, iters, nwalker)'''
+        return self.header['sampleArgs']
+
+    @property
+    def saved(self):
+        '''number of saved samples'''
+        return self.header['saved']
+
+    @property
+    def chain(self):
+        '''saved part of chain - shape (samples, walkers, params) - memmap'''
+        self._Open()
+        return self._chain[:self.saved]
+
+    @property
+    def lnp(self):
+        '''saved part of log probability - shape (samples, walkers) - memmap'''
+        self._Open()
+        return self._lnp[:self.saved]
+
+    def Create(self,pnames,walkers,samples,sampleArgs):
+        '''create new (empty) db for given number of samples'''
+        path=self.path.replace('\\','/')   #change dirs in path (for Windows)
+        if path.rfind('/')>0:
+            path=path[:path.rfind('/')+1]  #find current dir of db file
+            if not os.path.isdir(path): os.makedirs(path) #create dir of db file, if not exist
+        name=os.path.basename(self.path)
+        #old data files could not be mapped during overwriting
+        self._chain=None
+        self._lnp=None
+        self.header={'format':self.kind,'pnames':list(pnames),'sampleArgs':dict(sampleArgs),
+                     'walkers':int(walkers),'saved':0,'chain':name+'.chain.npy','lnp':name+'.lnp.npy'}
+        folder=os.path.dirname(self.path)
+        self._chain=np.lib.format.open_memmap(os.path.join(folder,self.header['chain']),mode='w+',
+                                              dtype=float,shape=(int(samples),int(walkers),len(pnames)))
+        self._lnp=np.lib.format.open_memmap(os.path.join(folder,self.header['lnp']),mode='w+',
+                                            dtype=float,shape=(int(samples),int(walkers)))
+        self.mode='r+'
+        self._SaveHeader()
+
+    def Resize(self,samples,sampleArgs=None):
+        '''change number of samples (e.g. for longer resumed run) - saved samples are kept'''
+        if sampleArgs is not None: self.header['sampleArgs']=dict(sampleArgs)
+        self._Open()
+        if samples>self._chain.shape[0]:
+            folder=os.path.dirname(self.path)
+            for key in ['chain','lnp']:
+                old=getattr(self,'_'+key)
+                setattr(self,'_'+key,None)   #file has to be closed before replacing
+                name=os.path.join(folder,self.header[key])
+                new=np.lib.format.open_memmap(name+'.tmp',mode='w+',dtype=float,shape=(int(samples),)+old.shape[1:])
+                n=max(1,chunk_size//max(old[0].size,1))
+                for i in range(0,self.saved,n):
+                    j=min(i+n,self.saved)
+                    new[i:j]=old[i:j]
+                new.flush()
+                del new,old
+                os.replace(name+'.tmp',name)
+            self._SaveHeader()
+            self._Load()
+        else: self._SaveHeader()
+
+    def Append(self,chain,lnp):
+        '''save new samples - chain with shape (samples, walkers, params), lnp with shape (samples, walkers)'''
+        self._Open()
+        n=self.saved
+        k=len(chain)
+        if n+k>self._chain.shape[0]: raise ValueError('Database is full! Resize it before appending new samples.')
+        self._chain[n:n+k]=chain
+        self._lnp[n:n+k]=lnp
+        self._chain.flush()
+        self._lnp.flush()
+        #samples are counted only after writing of data
+        self.header['saved']=n+k
+        self._SaveHeader()
+
+    def SaveInfo(self,info):
+        '''save info about finished sampling (e.g. reason of stopping) to header'''
+        self.header['info']=dict(info)
+        self._SaveHeader()
+
+    @property
+    def info(self):
+        '''info about finished sampling (empty if sampling was not finished)'''
+        return self.header.get('info',{})
+
+    def Last(self):
+        '''positions of walkers in last saved sample'''
+        self._Open()
+        return np.array(self._chain[self.saved-1])
+
+
+class TraceDB():
+    '''trace of GA or DE fitting (chi2 and values of parameters of all individuals in all generations) saved on disk
+    db file - header in JSON (names of parameters, size of population, number of saved generations)
+    data - in .npy file (memory-mapped), shape (generations, size, 1+params) - chi2 is in first column
+    each generation is written directly to memmap; number of saved generations in header is updated
+    at least every "flush_time" seconds -> unfinished (or killed) fitting could be inspected
+    '''
+    kind='OCFit-GA'
+
+    def __init__(self,path,mode='r'):
+        '''path - name of db file; mode - "r" (read only) or "r+" (appending of generations)'''
+        self.path=path
+        self.mode=mode
+        self.header={}
+        self._data=None
+        self._written=0     #number of generations written to memmap (not flushed yet)
+        self._flushed=0.    #time of last flush
+        if IsDB(path,self.kind): self._Load()
+
+    def _Load(self):
+        '''load header (data file is opened only when it is used - see _Open)'''
+        with open(self.path,'r') as f: self.header=json.load(f)
+        self._data=None
+        self._written=self.saved
+
+    def _Open(self):
+        '''open data file as memmap (if it is not open yet)'''
+        if self._data is None:
+            self._data=np.load(os.path.join(os.path.dirname(self.path),self.header['data']),mmap_mode=self.mode)
+
+    def _SaveHeader(self):
+        '''rewrite header (atomically - old header is valid until new one is written)'''
+        with open(self.path+'.tmp','w') as f: json.dump(self.header,f)
+        os.replace(self.path+'.tmp',self.path)
+
+    @property
+    def pnames(self):
+        '''names of fitted parameters'''
+        return self.header['pnames']
+
+    @property
+    def saved(self):
+        '''number of saved generations'''
+        return self.header['saved']
+
+    @property
+    def data(self):
+        '''saved generations - shape (generations, size, 1+params) - memmap'''
+        self._Open()
+        return self._data[:self.saved]
+
+    @property
+    def chi2(self):
+        '''chi2 of all individuals - shape (generations, size) - view of memmap'''
+        return self.data[:,:,0]
+
+    def Param(self,param):
+        '''values of parameter for all individuals - shape (generations, size) - view of memmap'''
+        return self.data[:,:,self.pnames.index(param)+1]
+
+    def Create(self,pnames,size,generations,dtype=float):
+        '''create new (empty) db for given number of generations (dtype - float32 or float64)'''
+        path=self.path.replace('\\','/')   #change dirs in path (for Windows)
+        if path.rfind('/')>0:
+            path=path[:path.rfind('/')+1]  #find current dir of db file
+            if not os.path.isdir(path): os.makedirs(path) #create dir of db file, if not exist
+        self._data=None   #old data file could not be mapped during overwriting
+        self.header={'format':self.kind,'pnames':list(pnames),'size':int(size),'saved':0,
+                     'data':os.path.basename(self.path)+'.trace.npy'}
+        self._data=np.lib.format.open_memmap(os.path.join(os.path.dirname(self.path),self.header['data']),mode='w+',
+                                             dtype=dtype,shape=(int(generations),int(size),len(pnames)+1))
+        self._written=0
+        self._flushed=0.
+        self.mode='r+'
+        self._SaveHeader()
+
+    def Append(self,chi2,values):
+        '''add one generation - chi2 with shape (size,), values of parameters with shape (size, params)
+        generation is written to memmap, header is updated after "flush_time" seconds (see Flush)'''
+        self._Open()
+        n=self._written
+        if n>=self._data.shape[0]: raise ValueError('Database is full!')
+        self._data[n,:,0]=chi2
+        self._data[n,:,1:]=values
+        self._written=n+1
+        if time()-self._flushed>=flush_time: self.Flush()
+
+    def Flush(self):
+        '''write all appended generations to disk and update their number in header'''
+        if self._written==self.saved: return
+        self._data.flush()
+        #generations are counted only after writing of data
+        self.header['saved']=self._written
+        self._SaveHeader()
+        self._flushed=time()
+
+
+def SaveArrays(path,arrays,header,cls=None):
+    '''save arrays and header (JSON-serializable dict) to one binary file - zip container (npz) with uncompressed .npy files
+    arrays could be loaded without parsing (see LoadArrays) and memory-mapped
+    cls - JSON encoder used for header
+    '''
+    with open(path+'.tmp','wb') as f:
+        with zipfile.ZipFile(f,'w',zipfile.ZIP_STORED) as z:
+            z.writestr('header.json',json.dumps(header,cls=cls))
+            for name in arrays:
+                with z.open(name+'.npy','w',force_zip64=True) as g: np.lib.format.write_array(g,np.asarray(arrays[name]))
+    os.replace(path+'.tmp',path)   #old file is valid until new one is written
+
+def IsArrays(path):
+    '''check if file is zip container created by SaveArrays'''
+    if not os.path.isfile(path): return False
+    with open(path,'rb') as f:
+        if not f.read(2)==b'PK': return False
+    try:
+        with zipfile.ZipFile(path,'r') as z: return 'header.json' in z.namelist()
+    except zipfile.BadZipFile: return False
+
+def LoadArrays(path,mmap=False):
+    '''load header and arrays saved by SaveArrays
+    mmap - arrays are memory-mapped (copy-on-write, file is not changed), otherwise they are read to RAM
+    output - header, dict with arrays
+    '''
+    arrays={}
+    with open(path,'rb') as f:
+        with zipfile.ZipFile(f,'r') as z:
+            header=json.loads(z.read('header.json').decode())
+            for info in z.infolist():
+                if not info.filename.endswith('.npy'): continue
+                name=info.filename[:-4]
+                if not mmap or not info.compress_type==zipfile.ZIP_STORED:
+                    with z.open(info) as g: arrays[name]=np.lib.format.read_array(g)
+                    continue
+                #position of data in file - after local header of zip file and header of npy
+                f.seek(info.header_offset)
+                local=f.read(30)
+                start=info.header_offset+30+int.from_bytes(local[26:28],'little')+int.from_bytes(local[28:30],'little')
+                f.seek(start)
+                version=np.lib.format.read_magic(f)
+                if version==(1,0): shape,fortran,dtype=np.lib.format.read_array_header_1_0(f)
+                else: shape,fortran,dtype=np.lib.format.read_array_header_2_0(f)
+                if dtype.hasobject: raise ValueError('Array "'+name+'" could not be memory-mapped!')
+                if np.prod(shape)==0: arrays[name]=np.zeros(shape,dtype=dtype)
+                else: arrays[name]=np.memmap(path,dtype=dtype,mode='c',offset=f.tell(),shape=shape,order='F' if fortran else 'C')
+    return header,arrays
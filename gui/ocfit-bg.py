@@ -1,12 +1,15 @@
 #!/usr/bin/python3
 
 #script for fitting on background using OCFit
-#input params: name_of_file number_of_generations size_of_gen number_of_MC_steps number_of_removed_steps binning_size save_fitting_sample
-#update: 10.12.2021
-# (c) Pavol Gajdos, 2021
+#input params: name_of_file number_of_generations size_of_gen number_of_MC_steps number_of_removed_steps binning_size save_fitting_sample [queue]
+#if folder of queue is given, fitting is only submitted to job server (see OCFit.jobs) - progress could be checked and fitting cancelled
+#update: 18.10.2026
+# (c) Pavol Gajdos, 2021-2026
 
 import sys
 import OCFit
+from OCFit.batch import RunPlan
+from OCFit.jobs import BackgroundPlan,Submit
 
 name=sys.argv[1].strip()    #name of input file with saved class
 path=name[:name.rfind('.')]
@@ -20,17 +23,15 @@ binnMC=float(sys.argv[6])       #binning size
 
 saveFit=bool(int(sys.argv[7]))   #save fitting sample to file; values = 0 / 1
 
-ocf=OCFit.OCFitLoad(name)       #loading class from file
+plan=BackgroundPlan(genGA,sizeGA,nMC,burnMC,binnMC,saveFit)   #GA and/or MCMC (with scaled errors)
 
-if genGA*sizeGA>0:
-    #fitting with GA
-    if saveFit: ocf.FitGA(genGA,sizeGA,db=path+'-ga.tmp')
-    else: ocf.FitGA(genGA,sizeGA)
+if len(sys.argv)>8:
+    #submit to queue of job server
+    print('Job '+Submit(name,plan,sys.argv[8].strip())+' submitted.')
+    sys.exit()
 
-if nMC>0:
-    #fitting with MCMC
-    if not ocf._set_err: ocf.AddWeight(1./ocf.err)
-    if saveFit: ocf.FitMCMC(nMC,burnMC,binnMC,db=path+'-mcmc.tmp')
-    else: ocf.FitMCMC(nMC,burnMC,binnMC)
+ocf=OCFit.OCFitLoad(name)       #loading class from file
+for method,kwargs in plan: kwargs['visible']=True
+RunPlan(ocf,plan,path)
 
 ocf.Save(name)  #save class to file
@@ -21,6 +21,8 @@ import subprocess
 import os,sys
 
 import OCFit
+import OCFit.jobs
+import OCFit.storage
 
 import pickle
 
@@ -172,10 +174,6 @@ def load():
         #load and analyse data file
         global data
 
-        f=open(path,'r')
-        lines=f.readlines()
-        f.close()
-
         delimiter=delimVar.get().strip()
 
         #set header
@@ -194,28 +192,13 @@ def load():
         if metVarCh.get()==1 and len(metVar.get())>0 and errVarCh.get()==0 and wVarCh.get()==0:
             cols['met']=int(metVar.get())
 
-        data={}
-        method=[]
-        for c in cols: data[c]=[]
-
         #reading data
-        for l in lines[header:]:
-            #remove blank lines or comments
-            if len(l.strip())==0: continue
-            if l[0]=='#': continue
-
-            if len(delimiter)==0: tmp=[x.strip() for x in l.split()]
-            else: tmp=[x.strip() for x in l.split(delimiter)]
-
-            for c in cols:
-                #add data to columns
-                if c=='met':
-                    #observing methods
-                    if not tmp[cols[c]].strip() in method: method.append(tmp[cols[c]].strip())
-                    data[c].append(tmp[cols[c]].strip())
-                else: data[c].append(float(tmp[cols[c]]))
+        data=OCFit.LoadMinima(path,cols,delimiter,header)
 
         if 'met' in cols:
+            #used methods in order of first occurrence
+            method,ind=np.unique(data['met'],return_index=True)
+            method=list(method[np.argsort(ind)])
             #transform observing methods to errors / weights
             metFile=path[:path.rfind('.')]+'-methods.txt'
             metDic={}
@@ -255,8 +238,7 @@ def load():
                 #transform observing methods to errors / weights
                 if valType.get()==0: c='err'
                 else: c='w'
-                data[c]=[]
-                for i in range(len(data['met'])): data[c].append(metDic[data['met'][i]])
+                data[c]=OCFit.MethodValues(data['met'],metDic)
 
                 tMet.destroy()
                 closeLoad()
@@ -1543,7 +1525,7 @@ def initC():
 def saveC(f=None):
     #save class to file
     if f is None:
-        f=tkinter.filedialog.asksaveasfilename(parent=master,title='Save class to file',filetypes=[('JSON files','*.json'),('OCFit files','*.ocf'),('All files','*.*')],defaultextension='.json')
+        f=tkinter.filedialog.asksaveasfilename(parent=master,title='Save class to file',filetypes=[('JSON files','*.json'),('Binary files','*.npz'),('OCFit files','*.ocf'),('All files','*.*')],defaultextension='.json')
     if len(f)==0: return
     ocf.Save(f)
     return f
@@ -1552,7 +1534,7 @@ def saveC(f=None):
 def loadC():
     #load class from file
     global ocf,systemParams
-    f=tkinter.filedialog.askopenfilename(parent=master,title='Load class from file',filetypes=[('JSON files','*.json'),('OCFit files','*.ocf'),('All files','*.*')])
+    f=tkinter.filedialog.askopenfilename(parent=master,title='Load class from file',filetypes=[('JSON files','*.json'),('Binary files','*.npz'),('OCFit files','*.ocf'),('All files','*.*')])
     if len(f)==0: return
     ocf=OCFit.OCFitLoad(f)
 
@@ -1736,8 +1718,12 @@ def infoMC():
 
         else:
             #MCMC
+            if OCFit.storage.IsDB(dbfile) and not OCFit.storage.IsDB(dbfile,OCFit.storage.ChainDB.kind):
+                #database of another kind (e.g. GA/DE)
+                tkinter.messagebox.showerror('Info MCMC/GA/DE','Incorrect input DB file! Try to change "file type".',parent=tIMC)
+                return
             try: info=OCFit.info_mc.InfoMC(dbfile)
-            except KeyError:
+            except (KeyError,ValueError,pickle.UnpicklingError):
                 tkinter.messagebox.showerror('Info MCMC/GA/DE','Incorrect input DB file! Try to change "file type". PYMC files are not supported!',parent=tIMC)
                 return
 
@@ -3964,6 +3950,15 @@ def runBG():
 
     f=saveC() #save class to file
 
+    if OCFit.jobs.ServerRunning():
+        #job server is running -> submit fitting to its queue (progress and cancellation in "python3 -m OCFit.jobs status")
+        result=tkinter.messagebox.askquestion('Run on background','Job server is running. Submit fitting to its queue?',icon='question')
+        if result=='yes':
+            plan=OCFit.jobs.BackgroundPlan(ga['gen'],ga['size'],mc['n'],mc['burn'],mc['binn'],save)
+            job=OCFit.jobs.Submit(f,plan)
+            tkinter.messagebox.showinfo('Run on background','Job '+job+' submitted.')
+            return
+
     cmd='nohup python3 -u ocfit-bg.py '+f+' '+str(ga['gen'])+' '+str(ga['size'])+' '+str(mc['n'])+' '+str(mc['burn'])+' '+\
             str(mc['binn'])+' '+str(save)+' > '+f[:f.rfind('.')]+'.log'  #generate command for fitting
 
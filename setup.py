@@ -17,7 +17,7 @@ dist=setup(name="OCFit",
           "Programming Language :: Python :: 3",
           "Topic :: Scientific/Engineering :: Astronomy"],
       url='https://github.com/pavolgaj/OCFit',
-      install_requires=['numpy>=1.10.2','matplotlib>=1.5.0','scipy>=1.5.0'],
-      extras_require={'MCMC': ['emcee>=3.0.0','corner','tqdm']},
-      py_modules=["OCFit/__init__","OCFit/OC_class","OCFit/info_mc","OCFit/info_ga","OCFit/ga"]
+      install_requires=['numpy>=1.10.2','matplotlib>=1.5.0','scipy>=1.9.0'],
+      extras_require={'MCMC': ['emcee>=3.0.0','corner','tqdm'],'numba': ['numba']},
+      py_modules=["OCFit/__init__","OCFit/OC_class","OCFit/info_mc","OCFit/info_ga","OCFit/ga","OCFit/kernels","OCFit/models","OCFit/storage","OCFit/batch","OCFit/jobs"]
 )
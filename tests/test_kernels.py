@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+
+#parity of NumPy and numba backends of OCFit (all models with compiled kernels)
+
+import warnings
+
+import numpy as np
+import pytest
+
+pytest.importorskip('numba')
+
+from OCFit import OCFit
+from OCFit import kernels
+
+warnings.simplefilter('ignore')
+
+P=1.5
+t0=2450000.
+#values of all parameters of built-in models
+params={'a_sin_i3':3.,'w3':1.2,'t03':2451000.,'P3':3000.,
+        'a_sin_i4':1.,'w4':4.,'t04':2452000.,'P4':900.,
+        't0':t0+0.001,'P':P+1e-6,'Q':1e-10,'a':0.05,'w':0.7,'mu3':0.001,'r3':2.,
+        'w0':0.5,'dw':0.001}
+#eccentricities: Newton-Raphson (e<0.9) and Markley (e>=0.9) solver of Kepler equation
+eccentricities={'low':{'e3':0.4,'e4':0.2,'e':0.1},'high':{'e3':0.95,'e4':0.92,'e':0.9}}
+
+
+def Data():
+    '''O-C diagram with primary and secondary minima'''
+    rng=np.random.RandomState(1)
+    E=np.sort(rng.choice(np.arange(0,8000,0.5),300,replace=False))
+    t=t0+P*E+rng.normal(scale=0.002,size=E.shape)
+    oc=0.01*np.sin(2*np.pi*E/3000)+rng.normal(scale=0.001,size=E.shape)
+    err=0.001*np.ones(E.shape)
+    return t,oc,err
+
+
+def Fit(model,ecc,backend):
+    t,oc,err=Data()
+    fit=OCFit(t,oc,err,backend=backend)
+    fit.Epoch(t0,P)
+    fit.model=model
+    fit.params=dict(params)
+    fit.params.update(eccentricities[ecc])
+    fit.fit_params=list(kernels.models[model][1])
+    return fit
+
+
+def test_minima_types():
+    '''data contain both primary and secondary minima (used by Apsidal models)'''
+    fit=Fit('Apsidal','low','numpy')
+    assert set(np.unique(fit._min_type))=={0,1}
+
+
+@pytest.mark.parametrize('ecc',['low','high'])
+@pytest.mark.parametrize('model',sorted(kernels.models))
+def test_model(model,ecc):
+    '''model O-C from compiled kernel is same as from NumPy (to 1e-12 d)'''
+    fit=Fit(model,ecc,'numba')
+    mid,order,use_epoch=kernels.models[model]
+    pars=np.array([[fit.params[p] for p in order]])
+    kernel=kernels.Model(mid,pars,fit.t,np.asarray(fit.epoch,dtype=float),np.asarray(fit._min_type,dtype=float),
+                         float(fit._t0P[0]),float(fit._t0P[1]))[0]
+    assert np.max(np.abs(kernel-fit.Model()))<1e-12
+
+
+@pytest.mark.parametrize('ecc',['low','high'])
+@pytest.mark.parametrize('model',sorted(kernels.models))
+def test_chi2(model,ecc):
+    '''chi2 of population is same for both backends'''
+    rng=np.random.RandomState(2)
+    fit=Fit(model,ecc,'numpy')
+    pop=np.array([[fit.params[p]*(1+1e-4*rng.randn()) for p in fit.fit_params] for i in range(20)])
+    for i,p in enumerate(fit.fit_params):
+        if p[0]=='e': pop[:,i]=np.clip(pop[:,i],0,0.99)
+    chi_np=fit.Chi2Batch(pop)
+    fit.backend='numba'
+    chi_nb=fit.Chi2Batch(pop)
+    assert np.allclose(chi_nb,chi_np,rtol=1e-9,atol=0)
+    assert np.isclose(fit.Chi2(fit.params),Fit(model,ecc,'numpy').Chi2(fit.params),rtol=1e-9,atol=0)